@@ -1,12 +1,113 @@
 import random
 import time
-import CheckersEngine
+import CheckersBook
+import CheckersCache
+import CheckersEvaluation
+import CheckersOrdering
+import CheckersTablebase
 
 piece_score = {"k": 3, "m": 1, "-": 0}
-DEPTH = 0
-counter = 0
-current_time = 0
-next_move = None
+
+# half width of the aspiration window of the principal variation search, in material points (a man is 1)
+ASPIRATION_WINDOW = 2
+# width of the null window of the principal variation search. The evaluation scores are floats (see
+# CheckersEvaluation), so a window of 1 would be a full window one man wide.
+NULL_WINDOW = 1e-6
+
+
+# Raised inside the search when the time or node budget of an iterative deepening search is used up, or when the
+# search is stopped from another thread
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchStats:
+    """
+    Statistics of one search, for logs and metrics. The Searcher keeps its counters in plain attributes while it
+    searches and copies them here after every completed iteration and at the end of the search, each time passing
+    the stats to its stats_callback. A fixed depth search has a single iteration.
+    """
+
+    def __init__(self):
+        self.nodes = 0  # end positions of the main search, its leaves are counted once, as quiescence nodes
+        self.quiescence_nodes = 0
+        self.nodes_per_ply = []  # positions whose moves were generated, by distance from the root
+        self.generated_moves = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stand_pat_cutoffs = 0
+        self.quiescence_ply_reached = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.evaluation_cache_probes = 0
+        self.evaluation_cache_hits = 0
+        self.tablebase_hits = 0
+        self.principal_variation_researches = 0
+        self.aspiration_researches = 0
+        self.iterations = []  # (depth, score, nodes, seconds) of every completed iteration, nodes counted per iteration
+        self.elapsed_time = 0.0  # in seconds
+        self.finished = False
+
+    # Average number of moves of the positions whose moves were generated
+    def get_branching_factor(self):
+        positions = sum(self.nodes_per_ply)
+        return self.generated_moves / positions if positions else 0.0
+
+    # Growth of the node count from one iteration to the next, from the last two iterations
+    def get_effective_branching_factor(self):
+        if len(self.iterations) < 2 or not self.iterations[-2][2]:
+            return 0.0
+        return self.iterations[-1][2] / self.iterations[-2][2]
+
+    def get_tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def get_evaluation_cache_hit_rate(self):
+        return self.evaluation_cache_hits / self.evaluation_cache_probes if self.evaluation_cache_probes else 0.0
+
+    def get_first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    # The stats as a dict of plain values, e.g. for a metrics exporter or json.dumps
+    def to_dict(self):
+        return {"nodes": self.nodes, "quiescence_nodes": self.quiescence_nodes,
+                "nodes_per_ply": list(self.nodes_per_ply), "generated_moves": self.generated_moves,
+                "branching_factor": self.get_branching_factor(),
+                "effective_branching_factor": self.get_effective_branching_factor(),
+                "cutoffs": self.cutoffs, "first_move_cutoff_rate": self.get_first_move_cutoff_rate(),
+                "stand_pat_cutoffs": self.stand_pat_cutoffs, "quiescence_ply_reached": self.quiescence_ply_reached,
+                "tt_probes": self.tt_probes, "tt_hit_rate": self.get_tt_hit_rate(),
+                "evaluation_cache_probes": self.evaluation_cache_probes,
+                "evaluation_cache_hit_rate": self.get_evaluation_cache_hit_rate(),
+                "tablebase_hits": self.tablebase_hits,
+                "principal_variation_researches": self.principal_variation_researches,
+                "aspiration_researches": self.aspiration_researches,
+                "iterations": [list(iteration) for iteration in self.iterations],
+                "elapsed_time": self.elapsed_time, "finished": self.finished}
+
+    def __str__(self):
+        return f"nodes: {self.nodes}, quiescence nodes: {self.quiescence_nodes}, " \
+               f"branching factor: {self.get_branching_factor():.2f}, cutoffs: {self.cutoffs}, " \
+               f"first move cutoff rate: {self.get_first_move_cutoff_rate():.2f}, " \
+               f"tt hit rate: {self.get_tt_hit_rate():.2f}, " \
+               f"evaluation cache hit rate: {self.get_evaluation_cache_hit_rate():.2f}, " \
+               f"iterations: {len(self.iterations)}, time: {self.elapsed_time:.3f}"
+
+
+# Result of a search done by a Searcher
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed_time, quiescence_nodes=0, stats=None):
+        self.best_move = best_move
+        self.score = score  # a positive score is good for white, a negative score is good for black
+        self.depth = depth  # depth of the deepest completed search
+        self.nodes = nodes
+        self.elapsed_time = elapsed_time  # in seconds
+        self.quiescence_nodes = quiescence_nodes
+        self.stats = stats  # SearchStats of the search, None for results not made by a Searcher
+
+    def __str__(self):
+        return f"best move: {self.best_move}, score: {self.score}, depth: {self.depth}, nodes: {self.nodes}, " \
+               f"quiescence nodes: {self.quiescence_nodes}, time: {self.elapsed_time}"
 
 
 def find_random_move(valid_moves):
@@ -19,295 +120,881 @@ def find_best_move_brute_force(gs):
     turn_multiplier = 1 if gs.white_to_move else -1
     opponent_min_max_score = 100
     best_player_move = None
-    possible_moves_extended = gs.get_all_possible_moves()
+    possible_moves_extended = gs.get_compact_moves()
 
     # random.shuffle(possible_moves_extended) # to select random move among moves with same scores
 
     for player_move in possible_moves_extended:
-        gs.make_move_extended(player_move)
-        oppenent_moves = gs.get_all_possible_moves()
+        gs.make_compact_move(player_move)
+        oppenent_moves = gs.get_compact_moves()
         opponent_max_score = -255
         for oppenent_move in oppenent_moves:
-            gs.make_move_extended(oppenent_move)
-            score = - turn_multiplier * score_material(gs.board)
+            gs.make_compact_move(oppenent_move)
+            score = - turn_multiplier * gs.material_score
             if score > opponent_max_score:
                 opponent_max_score = score
-            gs.undo_move()
+            gs.undo_compact_move()
         if opponent_max_score < opponent_min_max_score:
             opponent_min_max_score = opponent_max_score
             best_player_move = player_move
-        gs.undo_move()
+        gs.undo_compact_move()
 
     return best_player_move
 
 
-# alpha = the worst possible score for white
-# beta = the worst possible score gor black
-def find_move_min_max_alpha_beta_improved(gs, depth, alpha, beta):
-    global next_move
-    global counter
-
-    # if gs.is_game_over():
-    #     print(f"GAME OVER works for {'white' if not gs.white_to_move else 'black'}")
-    #     return 255 if not gs.white_to_move else -255
-
-    if depth == 0:
-
-        counter += 1
-        possible_moves_extended = gs.get_all_possible_captures()
-        if len(possible_moves_extended) > 0:
-            depth += 1
+class Searcher:
+    """
+    Owns everything one search needs: its configuration, the transposition table and move orderer, the statistics
+    and the result. Searchers share no state, so several searches can run at the same time, one Searcher each.
+    A Searcher can be reused for the next move of the same game, its caches then carry over.
+    The search itself prints nothing, its statistics are returned as SearchResult.stats and passed to
+    stats_callback (a function of one SearchStats argument) after every completed iteration.
+    """
+
+    def __init__(self, depth=8, time_budget_ms=1000, node_budget=None, tt_memory_mb=16,
+                 transposition_table=None, move_orderer=None, max_quiescence_ply=8, stand_pat=False,
+                 opening_book=None, tablebase=None, stats_callback=None, eval_cache_mb=4, evaluation_cache=None,
+                 evaluation=None):
+        self.depth = depth  # fixed depth, and maximum depth of an iterative deepening search
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget  # counts the nodes of the main and of the quiescence search
+        self.max_quiescence_ply = max_quiescence_ply  # captures searched at most after the end of the main search
+        self.stand_pat = stand_pat  # unsound for draughts, captures are compulsory (see quiescence)
+        self.opening_book = opening_book  # a CheckersBook.OpeningBook consulted before every search
+        self.tablebase = tablebase  # a CheckersTablebase.Tablebase probed in positions with few pieces
+        self.stats_callback = stats_callback
+        self.evaluation = evaluation  # a CheckersEvaluation.Evaluation, None evaluates material only
+        self.transposition_table = transposition_table if transposition_table is not None \
+            else CheckersCache.TranspositionTable(tt_memory_mb)
+        self.move_orderer = move_orderer if move_orderer is not None else CheckersOrdering.MoveOrderer()
+        # static scores by position key, None (eval_cache_mb=0) evaluates every leaf again
+        self.evaluation_cache = evaluation_cache if evaluation_cache is not None \
+            else CheckersCache.EvaluationCache(eval_cache_mb) if eval_cache_mb else None
+        # one move buffer per ply, filled by GameState.generate_moves and reused by every node of the ply
+        self.move_buffers = []
+        self.ply_nodes = []  # positions whose moves were generated, per ply
+        self.generated_moves = 0
+
+        self.root_depth = 0
+        self.counter = 0
+        self.quiescence_nodes = 0
+        self.stand_pat_cutoffs = 0
+        self.quiescence_ply_reached = 0  # deepest quiescence ply of the current search
+        self.tablebase_hits = 0
+        self.principal_variation_researches = 0  # null-window searches that failed and were searched again
+        self.aspiration_researches = 0  # iterations searched again because the score fell outside the window
+        self.current_time = 0
+        self.next_move = None
+        self.deadline = None  # time.time() at which an iterative deepening search has to stop
+        self.node_limit = None  # counter value at which an iterative deepening search has to stop
+        self.stop_requested = False  # set by another thread to abort the search with SearchTimeout (see CheckersPonder)
+        self.root_move_log_length = 0  # len(gs.compact_move_log) at the root of the current search
+        self.root_move = None  # compact move to search first at the root
+        self.stats = SearchStats()
+        self.iteration_start_nodes = 0
+        self.iteration_start_time = 0
+        self.tt_hits_at_start = 0
+        self.tt_probes_at_start = 0
+        self.evaluation_cache_hits_at_start = 0
+        self.evaluation_cache_probes_at_start = 0
+        self.result = None
+
+    def start_search(self, gs, depth, first_move=None):
+        self.counter = 0
+        self.quiescence_nodes = 0
+        self.stand_pat_cutoffs = 0
+        self.quiescence_ply_reached = 0
+        self.tablebase_hits = 0
+        self.principal_variation_researches = 0
+        self.aspiration_researches = 0
+        for ply in range(len(self.ply_nodes)):
+            self.ply_nodes[ply] = 0
+        self.generated_moves = 0
+        self.root_depth = depth
+        self.next_move = None
+        self.current_time = time.time()
+        self.set_search_root(gs, first_move)
+        self.move_orderer.new_search()
+
+        self.stats = SearchStats()
+        self.iteration_start_nodes = 0
+        self.iteration_start_time = self.current_time
+        self.tt_hits_at_start = self.transposition_table.hits
+        self.tt_probes_at_start = self.transposition_table.hits + self.transposition_table.misses
+        if self.evaluation_cache is not None:
+            self.evaluation_cache_hits_at_start = self.evaluation_cache.hits
+            self.evaluation_cache_probes_at_start = self.evaluation_cache.hits + self.evaluation_cache.misses
+
+    def finish_search(self, score, depth):
+        stats = self.update_stats()
+        stats.finished = True
+        if self.stats_callback is not None:
+            self.stats_callback(stats)
+        self.result = SearchResult(self.next_move, score, depth, self.counter, stats.elapsed_time,
+                                   self.quiescence_nodes, stats)
+        return self.result
+
+    # Copy the counters of the search into self.stats and return it
+    def update_stats(self):
+        stats = self.stats
+        stats.nodes = self.counter
+        stats.quiescence_nodes = self.quiescence_nodes
+        stats.nodes_per_ply = self.ply_nodes[:]
+        while stats.nodes_per_ply and not stats.nodes_per_ply[-1]:
+            stats.nodes_per_ply.pop()
+        stats.generated_moves = self.generated_moves
+        stats.cutoffs = self.move_orderer.cutoffs
+        stats.first_move_cutoffs = self.move_orderer.first_move_cutoffs
+        stats.stand_pat_cutoffs = self.stand_pat_cutoffs
+        stats.quiescence_ply_reached = self.quiescence_ply_reached
+        stats.tt_hits = self.transposition_table.hits - self.tt_hits_at_start
+        stats.tt_probes = self.transposition_table.hits + self.transposition_table.misses - self.tt_probes_at_start
+        if self.evaluation_cache is not None:
+            stats.evaluation_cache_hits = self.evaluation_cache.hits - self.evaluation_cache_hits_at_start
+            stats.evaluation_cache_probes = self.evaluation_cache.hits + self.evaluation_cache.misses - \
+                self.evaluation_cache_probes_at_start
+        stats.tablebase_hits = self.tablebase_hits
+        stats.principal_variation_researches = self.principal_variation_researches
+        stats.aspiration_researches = self.aspiration_researches
+        stats.elapsed_time = time.time() - self.current_time
+        return stats
+
+    # Record a completed iteration (the whole search for the fixed depth searches) in the stats and pass them to
+    # the stats callback
+    def record_iteration(self, depth, score):
+        now = time.time()
+        nodes = self.counter + self.quiescence_nodes
+        self.stats.iterations.append((depth, score, nodes - self.iteration_start_nodes,
+                                      now - self.iteration_start_time))
+        self.iteration_start_nodes = nodes
+        self.iteration_start_time = now
+        if self.stats_callback is not None:
+            self.stats_callback(self.update_stats())
+
+    # Return the result of the book move if the position is in the opening book, otherwise None
+    def find_book_move(self, gs):
+        if self.opening_book is None:
+            return None
+        entry = self.opening_book.find_move(gs)
+        if entry is None:
+            return None
+        move, score, depth = entry
+        self.start_search(gs, 0)
+        self.next_move = move
+        return self.finish_search(score, depth)
+
+    # Exact score of the position from the tablebase (positive is good for white), or None if the position has more
+    # pieces than the tablebase. The piece count is checked first, so the probe costs nothing in the middlegame.
+    def probe_tablebase(self, gs):
+        tablebase = self.tablebase
+        if tablebase is None or sum(gs.piece_counts.values()) > tablebase.max_pieces:
+            return None
+        score = tablebase.probe(gs)
+        if score is not None:
+            self.tablebase_hits += 1
+        return score
+
+    # Return the result of the best move according to the tablebase if every move of the position leads to a
+    # tablebase position, otherwise None. The fastest win, or the slowest loss, is chosen.
+    def find_tablebase_move(self, gs):
+        if self.tablebase is None or sum(gs.piece_counts.values()) > self.tablebase.max_pieces:
+            return None
+        self.start_search(gs, 0)
+        moves, count = self.generate_moves(gs, 0)
+        best_move = None
+        best_score = None
+        for move_index in range(count):
+            move = moves[move_index]
+            gs.make_compact_move(move)
+            score = self.probe_tablebase(gs)
+            gs.undo_compact_move()
+            if score is None:
+                return None
+            if best_score is None or (score > best_score if gs.white_to_move else score < best_score):
+                best_move = move
+                best_score = score
+        if best_move is None:
+            return None
+        self.next_move = best_move
+        return self.finish_search(best_score, 0)
+
+    # Fill the move buffer of the ply with the compact moves (or only the captures) of gs.
+    # Return the buffer and the number of moves written to it.
+    def generate_moves(self, gs, ply, captures_only=False):
+        while ply >= len(self.move_buffers):
+            self.move_buffers.append([])
+            self.ply_nodes.append(0)
+        moves = self.move_buffers[ply]
+        count = gs.generate_moves(moves, captures_only)
+        self.ply_nodes[ply] += 1
+        self.generated_moves += count
+        return moves, count
+
+    # Static evaluation of a leaf, a positive score is good for white. Quiescence reaches the same positions through
+    # different capture orders, so the scores are kept in the evaluation cache.
+    def evaluate(self, gs):
+        evaluation_cache = self.evaluation_cache
+        if evaluation_cache is None:
+            return self.compute_evaluation(gs)
+        key = gs.zobrist_key
+        score = evaluation_cache.probe(key)
+        if score is None:
+            score = self.compute_evaluation(gs)
+            evaluation_cache.store(key, score)
+        return score
+
+    # Without an evaluation only the material counts. The material is kept up to date by the GameState, so this
+    # costs O(1) instead of a scan of the board like score_material.
+    def compute_evaluation(self, gs):
+        if self.evaluation is None:
+            return gs.material_score
+        return self.evaluation.evaluate(gs)
+
+    # Quiescence search, called at the leaves of the min-max searches. Only captures are searched, so a leaf is not
+    # evaluated in the middle of an exchange. A position without a capture for the side to move is quiet and is
+    # evaluated. Captures are compulsory, so by default (stand_pat off) every capture line is searched until the
+    # position is quiet: the static score is not an option for a side that has to capture. With stand_pat on, the
+    # static evaluation is also used as a bound for the side to move, which cuts most capture lines but assumes the
+    # side could decline the capture, so forced shots are misjudged. At most max_quiescence_ply captures are searched
+    # after the leaf.
+    def quiescence(self, gs, alpha, beta, ply, quiescence_ply=0):
+        self.check_search_limits()
+        self.quiescence_nodes += 1
+        if quiescence_ply > self.quiescence_ply_reached:
+            self.quiescence_ply_reached = quiescence_ply
+
+        tablebase_score = self.probe_tablebase(gs)
+        if tablebase_score is not None:
+            return tablebase_score
+        score = self.evaluate(gs)
+        if quiescence_ply >= self.max_quiescence_ply:
+            return score
+        moves, count = self.generate_moves(gs, ply, True)
+        if count == 0:
+            return score
+
+        white_to_move = gs.white_to_move
+        if not self.stand_pat:
+            best_score = -255 if white_to_move else 255
+        elif white_to_move:
+            if score >= beta:
+                self.stand_pat_cutoffs += 1
+                return score
+            alpha = max(alpha, score)
+            best_score = score
         else:
-            return score_material(gs.board)
-    else:
-        possible_moves_extended = gs.get_all_possible_moves()
-        if len(possible_moves_extended) == 0:
-            counter += 1
-
-            print(f"GAME ENDS AND {'black' if gs.white_to_move else 'white'} wins. Depth: {depth}")
+            if score <= alpha:
+                self.stand_pat_cutoffs += 1
+                return score
+            beta = min(beta, score)
+            best_score = score
+
+        # the captures are ordered by the value of the captured pieces
+        self.move_orderer.order_moves(moves, count, ply)
+        for move_index in range(count):
+            gs.make_compact_move(moves[move_index])
+            score = self.quiescence(gs, alpha, beta, ply + 1, quiescence_ply + 1)
+            gs.undo_compact_move()
+            if white_to_move:
+                if score > best_score:
+                    best_score = score
+                    alpha = max(alpha, score)
+            elif score < best_score:
+                best_score = score
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+        return best_score
+
+    # Helper method to make first recursive call
+    def find_best_move_min_max(self, gs, depth=None):
+        known_result = self.find_book_move(gs) or self.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        depth = self.depth if depth is None else depth
+        self.start_search(gs, depth)
+        # find_move_min_max(gs, depth)
+        score = self.find_move_min_max_alpha_beta_improved(gs, depth, -255, 255)
+        self.record_iteration(depth, score)
+        return self.finish_search(score, depth)
+
+    # alpha = the worst possible score for white
+    # beta = the worst possible score gor black
+    def find_move_min_max_alpha_beta_improved(self, gs, depth, alpha, beta, ply=0):
+
+        # if gs.is_game_over():
+        #     print(f"GAME OVER works for {'white' if not gs.white_to_move else 'black'}")
+        #     return 255 if not gs.white_to_move else -255
+
+        if depth == 0:  # the leaf is counted by quiescence
+            return self.quiescence(gs, alpha, beta, ply)
+
+        if depth != self.root_depth:
+            tablebase_score = self.probe_tablebase(gs)
+            if tablebase_score is not None:
+                self.counter += 1
+                return tablebase_score
+
+        moves, count = self.generate_moves(gs, ply)
+        if count == 0:
+            self.counter += 1
             return -100 if gs.white_to_move else 100
 
-    # if depth == DEPTH:
-    #     random.shuffle(possible_moves_extended)
-
-
+        # if depth == self.root_depth:
+        #     random.shuffle(possible_moves_extended)
+
+        move_id = 0
+
+        if depth == self.root_depth and count == 1:
+            self.counter += 1
+            self.next_move = moves[0]
+            return
+
+        self.move_orderer.order_moves(moves, count, ply)
+
+        if gs.white_to_move:
+            max_score = -255
+            for move_index in range(count):
+                move = moves[move_index]
+
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta, ply + 1)
+                # print(f"Score: {score}, max_score: {max_score}, depth: {depth}, alpha: {alpha}, beta: {beta}")
+                if score > max_score:
+                    max_score = score
+                    alpha = max(alpha, max_score)
+                    if alpha >= beta:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if depth == self.root_depth:
+                        self.next_move = move
 
-    move_id = 0
+                gs.undo_compact_move()
+            return max_score
+        else:
+            min_score = 255
+            for move_index in range(count):
+                move = moves[move_index]
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta, ply + 1)
+                if score < min_score:
+                    min_score = score
+                    beta = min(beta, min_score)
+                    if beta <= alpha:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if depth == self.root_depth:
+                        self.next_move = move
+                        if count == 1:
+                            break
+                gs.undo_compact_move()
+            return min_score
+
+    def find_move_min_max_alpha_beta(self, gs, depth, alpha, beta, ply=0):
+        if depth == 0:
+            self.counter += 1
+            return self.evaluate(gs)
+
+        moves, count = self.generate_moves(gs, ply)
+        self.move_orderer.order_moves(moves, count, ply)
+
+        # if depth == self.root_depth:
+        #     random.shuffle(possible_moves_extended)
+
+        move_id = 0
+
+        if gs.white_to_move:
+            max_score = -255
+            for move_index in range(count):
+                move = moves[move_index]
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta(gs, depth-1, alpha, beta, ply + 1)
+                if score > max_score:
+                    max_score = score
+                    if max_score >= beta:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if depth == self.root_depth:
+                        self.next_move = move
 
-    if depth == DEPTH and len(possible_moves_extended) == 1:
-        counter += 1
-        next_move = possible_moves_extended[0]
-        return
+                alpha = max(alpha, max_score)
+                gs.undo_compact_move()
+            return max_score
+        else:
+            min_score = 255
+            for move_index in range(count):
+                move = moves[move_index]
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta(gs, depth - 1, alpha, beta, ply + 1)
+                if score < min_score:
+                    min_score = score
+                    if min_score <= alpha:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if depth == self.root_depth:
+                        self.next_move = move
 
+                beta = min(beta, min_score)
+                gs.undo_compact_move()
+            return min_score
+
+    def find_move_min_max(self, gs, depth, ply=0):
+        self.counter += 1
+
+        if depth == 0:
+            return self.evaluate(gs)
+
+        moves, count = self.generate_moves(gs, ply)
+
+        # if depth == self.root_depth:
+        #     random.shuffle(possible_moves_extended)
+
+        if gs.white_to_move:
+            max_score = -255
+            for move_index in range(count):
+                move = moves[move_index]
+                gs.make_compact_move(move)
+                score = self.find_move_min_max(gs, depth-1, ply + 1)
+                if score > max_score:
+                    max_score = score
+                    if depth == self.root_depth:
+                        self.next_move = move
+                gs.undo_compact_move()
+            return max_score
+        else:
+            min_score = 255
+            for move_index in range(count):
+                move = moves[move_index]
+                gs.make_compact_move(move)
+                score = self.find_move_min_max(gs, depth - 1, ply + 1)
+                if score < min_score:
+                    min_score = score
+                    if depth == self.root_depth:
+                        self.next_move = move
+                gs.undo_compact_move()
+            return min_score
+
+    def find_best_move_nega_max(self, gs, depth=None):
+        known_result = self.find_book_move(gs) or self.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        depth = self.depth if depth is None else depth
+        self.start_search(gs, depth)
+        # find_move_nega_max(gs, depth, 1 if gs.white_to_move else -1)
+        turn_multiplier = 1 if gs.white_to_move else -1
+        score = self.find_move_nega_max_alpha_beta(gs, depth, -255, 255, turn_multiplier)
+        self.record_iteration(depth, turn_multiplier * score)
+        return self.finish_search(turn_multiplier * score, depth)
+
+    def find_move_nega_max(self, gs, depth, turn_multiplier, ply=0):
+        self.counter += 1
+
+        if depth == 0:
+            return turn_multiplier * self.evaluate(gs)
+
+        moves, count = self.generate_moves(gs, ply)
 
-    if gs.white_to_move:
         max_score = -255
-        for move in possible_moves_extended:
-
 
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta)
-            # print(f"Score: {score}, max_score: {max_score}, depth: {depth}, alpha: {alpha}, beta: {beta}")
+        for move_index in range(count):
+            move = moves[move_index]
+            gs.make_compact_move(move)
+            score = -self.find_move_nega_max(gs, depth-1, -turn_multiplier, ply + 1)
             if score > max_score:
                 max_score = score
-                alpha = max(alpha, max_score)
-                if alpha >= beta:
-                    gs.undo_move()
-                    break
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"turn: {'white'}, move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-
-
-            gs.undo_move()
+                if depth == self.root_depth:
+                    self.next_move = move
+            gs.undo_compact_move()
         return max_score
-    else:
-        min_score = 255
-        for move in possible_moves_extended:
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta)
-            if score < min_score:
-                min_score = score
-                beta = min(beta, min_score)
-                if beta <= alpha:
-                    gs.undo_move()
-                    break
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"turn: {'black'}, move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-                    if len(possible_moves_extended) == 1:
-                        break
-            gs.undo_move()
-        return min_score
-
-
-# Helper method to make first recursive call
-def find_best_move_min_max(gs, depth=8):
-    global next_move, DEPTH, counter, current_time
-    counter = 0
-    DEPTH = depth
-    # find_move_min_max(gs, depth)
-    next_move = None
-    current_time = time.time()
-    find_move_min_max_alpha_beta_improved(gs, depth, -255, 255)
-    print(f"possible move count: {counter}, time: {time.time() - current_time}")
-    print("*******************************")
-    return next_move
-
 
-def find_move_min_max_alpha_beta(gs, depth, alpha, beta):
-    global next_move
-    global counter
+    def find_move_nega_max_alpha_beta(self, gs, depth, alpha, beta, turn_multiplier, ply=0):
+        # self.counter += 1
 
-    if depth == 0:
-        counter += 1
-        return score_material(gs.board)
+        if depth == 0:
+            self.counter += 1
 
-    possible_moves_extended = gs.get_all_possible_moves()
+            # possible_moves_extended = gs.get_all_possible_moves()
+            # if len(possible_moves_extended) == 0:
+            #     return -255
+            # if gs.is_capturing:
+            #     depth = 1
+            # else:
+            #     return turn_multiplier * score_material(gs.board)
+            return turn_multiplier * self.evaluate(gs)
 
-    # if depth == DEPTH:
-    #     random.shuffle(possible_moves_extended)
+        moves, count = self.generate_moves(gs, ply)
+        self.move_orderer.order_moves(moves, count, ply)
 
-    move_id = 0
+        # if depth == self.root_depth:
+        #     random.shuffle(possible_moves_extended)
 
-    if gs.white_to_move:
         max_score = -255
-        for move in possible_moves_extended:
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta(gs, depth-1, alpha, beta)
+        m = 0
+        for move_index in range(count):
+            move = moves[move_index]
+            m += 1
+            gs.make_compact_move(move)
+            score = -self.find_move_nega_max_alpha_beta(gs, depth-1, -beta, -alpha, -turn_multiplier, ply + 1)
             if score > max_score:
                 max_score = score
-                if max_score >= beta:
-                    gs.undo_move()
-                    break
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-
-            alpha = max(alpha, max_score)
-            gs.undo_move()
+                if depth == self.root_depth:
+                    self.next_move = move
+            gs.undo_compact_move()
+            if max_score > alpha:  # pruning happens
+                alpha = max_score
+            if alpha >= beta:
+                self.move_orderer.record_cutoff(move, depth, ply, m - 1)
+                break
         return max_score
-    else:
-        min_score = 255
-        for move in possible_moves_extended:
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta(gs, depth - 1, alpha, beta)
-            if score < min_score:
-                min_score = score
-                if min_score <= alpha:
-                    gs.undo_move()
-                    break
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
 
-            beta = min(beta, min_score)
-            gs.undo_move()
-        return min_score
+    # Principal variation search: iterative deepening up to depth, every iteration is searched by
+    # find_move_principal_variation in an aspiration window of aspiration_window around the score of the previous
+    # iteration. When the score falls outside the window, the side that failed is opened and the iteration is
+    # searched again.
+    def find_best_move_principal_variation(self, gs, depth=None, aspiration_window=ASPIRATION_WINDOW):
+        known_result = self.find_book_move(gs) or self.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        depth = self.depth if depth is None else depth
+        self.start_search(gs, depth)
+        self.transposition_table.new_search()
+
+        moves, count = self.generate_moves(gs, 0)
+        if count <= 1:
+            self.next_move = moves[0] if count else None
+            return self.finish_search(None, 0)
+
+        turn_multiplier = 1 if gs.white_to_move else -1
+        best_move = None
+        score = None
+        for iteration_depth in range(1, depth + 1):
+            self.root_depth = iteration_depth
+            self.set_search_root(gs, best_move)
+            if score is None:
+                alpha, beta = -255, 255
+            else:
+                alpha, beta = max(score - aspiration_window, -255), min(score + aspiration_window, 255)
+            while True:
+                self.next_move = None
+                score = self.find_move_principal_variation(gs, iteration_depth, alpha, beta, turn_multiplier)
+                if score <= alpha and alpha > -255:
+                    alpha = -255
+                elif score >= beta and beta < 255:
+                    beta = 255
+                else:
+                    break
+                self.aspiration_researches += 1
+            best_move = self.next_move
+            self.record_iteration(iteration_depth, turn_multiplier * score)
+
+        self.next_move = best_move
+        return self.finish_search(turn_multiplier * score, depth)
+
+    # Negamax alpha-beta search, the score is for the side to move. The first move of a position is searched with
+    # the full window, every other move with the null window (alpha, alpha + NULL_WINDOW), which only proves that
+    # the move is no better than the best move so far. A move that fails the proof is searched again with the full
+    # window.
+    # The transposition table is shared with the min-max searches, so its scores and bounds are stored for white.
+    def find_move_principal_variation(self, gs, depth, alpha, beta, turn_multiplier, ply=0):
+        self.check_search_limits()
+
+        if depth == 0:  # the leaf is counted by quiescence
+            if turn_multiplier > 0:
+                return self.quiescence(gs, alpha, beta, ply)
+            return -self.quiescence(gs, -beta, -alpha, ply)
+
+        if ply:
+            tablebase_score = self.probe_tablebase(gs)
+            if tablebase_score is not None:
+                self.counter += 1
+                return turn_multiplier * tablebase_score
+
+        moves, count = self.generate_moves(gs, ply)
+        if count == 0:
+            self.counter += 1
+            return -100
+
+        transposition_table = self.transposition_table
+        key = gs.zobrist_key
+        alpha_original = alpha
+        beta_original = beta
+        tt_move = None
+        index = transposition_table.probe(key)
+        if index >= 0:
+            tt_move = transposition_table.moves[index]
+            if ply and transposition_table.depths[index] >= depth:
+                score = turn_multiplier * transposition_table.scores[index]
+                flag = transposition_table.flags[index]
+                if turn_multiplier < 0 and flag != CheckersCache.EXACT:
+                    # a lower bound of the score for white is an upper bound of the score for black
+                    flag = CheckersCache.UPPER_BOUND if flag == CheckersCache.LOWER_BOUND else CheckersCache.LOWER_BOUND
+                if flag == CheckersCache.EXACT:
+                    return score
+                elif flag == CheckersCache.LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        if not ply and self.root_move is not None:
+            tt_move = self.root_move
+        self.move_orderer.order_moves(moves, count, ply, tt_move)
+
+        best_score = -255
+        best_move = None
+        for move_index in range(count):
+            move = moves[move_index]
+            gs.make_compact_move(move)
+            if move_index == 0:
+                score = -self.find_move_principal_variation(gs, depth - 1, -beta, -alpha, -turn_multiplier, ply + 1)
+            else:
+                score = -self.find_move_principal_variation(gs, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                            -turn_multiplier, ply + 1)
+                if alpha < score < beta:
+                    self.principal_variation_researches += 1
+                    score = -self.find_move_principal_variation(gs, depth - 1, -beta, -alpha, -turn_multiplier,
+                                                                ply + 1)
+            gs.undo_compact_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if not ply:
+                    self.next_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_index)
+                        break
 
-def find_move_min_max(gs, depth):
-    global next_move
-    global counter
+        if best_score <= alpha_original:
+            flag = CheckersCache.UPPER_BOUND if turn_multiplier > 0 else CheckersCache.LOWER_BOUND
+        elif best_score >= beta_original:
+            flag = CheckersCache.LOWER_BOUND if turn_multiplier > 0 else CheckersCache.UPPER_BOUND
+        else:
+            flag = CheckersCache.EXACT
+        transposition_table.store(key, depth, turn_multiplier * best_score, flag, best_move)
+        return best_score
+
+    # Helper method to make first recursive call of the search with the transposition table
+    def find_best_move_min_max_with_cache(self, gs, depth=None):
+        known_result = self.find_book_move(gs) or self.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        depth = self.depth if depth is None else depth
+        self.start_search(gs, depth)
+        self.transposition_table.new_search()
+        score = self.find_move_min_max_alpha_beta_improved_with_cache(gs, depth, -255, 255)
+        self.record_iteration(depth, score)
+        return self.finish_search(score, depth)
+
+    # Search with increasing depth (1, 2, 3, ...) until the time budget (in milliseconds) or the node budget is used
+    # up, and return the best move of the deepest completed iteration. The best move of each iteration and the
+    # transposition table filled by it are used to order the moves of the next iteration.
+    # The budgets are only checked after the first iteration, so a move is always returned.
+    def find_best_move_iterative_deepening(self, gs, time_budget_ms=None, node_budget=None, max_depth=None):
+        known_result = self.find_book_move(gs) or self.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        time_budget_ms = self.time_budget_ms if time_budget_ms is None else time_budget_ms
+        node_budget = self.node_budget if node_budget is None else node_budget
+        max_depth = self.depth if max_depth is None else max_depth
+        self.start_search(gs, 0)
+        self.transposition_table.new_search()
+
+        moves, count = self.generate_moves(gs, 0)
+        if count <= 1:
+            self.next_move = moves[0] if count else None
+            return self.finish_search(None, 0)
+
+        best_move = None
+        best_score = None
+        completed_depth = 0
+        for depth in range(1, max_depth + 1):
+            self.root_depth = depth
+            self.next_move = None
+            self.set_search_root(gs, best_move)
+            try:
+                score = self.find_move_min_max_alpha_beta_improved_with_cache(gs, depth, -255, 255)
+            except SearchTimeout:
+                while len(gs.compact_move_log) > self.root_move_log_length:
+                    gs.undo_compact_move()
+                break
+            finally:
+                self.deadline = None
+                self.node_limit = None
+            best_move = self.next_move
+            best_score = score
+            completed_depth = depth
+            self.record_iteration(depth, score)
+
+            self.deadline = self.current_time + time_budget_ms / 1000
+            self.node_limit = node_budget
+            if time.time() >= self.deadline or \
+                    self.node_limit is not None and self.counter + self.quiescence_nodes >= self.node_limit:
+                break
+        self.deadline = None
+        self.node_limit = None
+
+        self.next_move = best_move
+        return self.finish_search(best_score, completed_depth)
+
+    def set_search_root(self, gs, first_move):
+        self.root_move_log_length = len(gs.compact_move_log)
+        self.root_move = first_move
+
+    def check_search_limits(self):
+        if self.stop_requested or self.deadline is not None and time.time() >= self.deadline or \
+                self.node_limit is not None and self.counter + self.quiescence_nodes >= self.node_limit:
+            raise SearchTimeout()
+
+    # Same search as find_move_min_max_alpha_beta_improved, but the score, the bound type and the best move of every
+    # searched position is stored in the transposition table. Positions reached again through another move order
+    # are answered from the table, and the stored best move is searched first.
+    def find_move_min_max_alpha_beta_improved_with_cache(self, gs, depth, alpha, beta, ply=0):
+        self.check_search_limits()
+        is_root = len(gs.compact_move_log) == self.root_move_log_length
+
+        if depth == 0:  # the leaf is counted by quiescence
+            return self.quiescence(gs, alpha, beta, ply)
+
+        if not is_root:
+            tablebase_score = self.probe_tablebase(gs)
+            if tablebase_score is not None:
+                self.counter += 1
+                return tablebase_score
+
+        moves, count = self.generate_moves(gs, ply)
+        if count == 0:
+            self.counter += 1
+            return -100 if gs.white_to_move else 100
 
-    counter += 1
+        if is_root and count == 1:
+            self.counter += 1
+            self.next_move = moves[0]
+            return
+
+        transposition_table = self.transposition_table
+        key = gs.zobrist_key
+        alpha_original = alpha
+        beta_original = beta
+        tt_move = None
+        index = transposition_table.probe(key)
+        if index >= 0:
+            tt_move = transposition_table.moves[index]
+            if not is_root and transposition_table.depths[index] >= depth:
+                score = transposition_table.scores[index]
+                flag = transposition_table.flags[index]
+                if flag == CheckersCache.EXACT:
+                    return score
+                elif flag == CheckersCache.LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        # search the best move of the previous iteration, or else the best move of the earlier search, first
+        if is_root and self.root_move is not None:
+            tt_move = self.root_move
+        self.move_orderer.order_moves(moves, count, ply, tt_move)
+
+        move_id = 0
+        best_move = None
+
+        if gs.white_to_move:
+            max_score = -255
+            for move_index in range(count):
+                move = moves[move_index]
+
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta_improved_with_cache(gs, depth - 1, alpha, beta, ply + 1)
+                if score > max_score:
+                    max_score = score
+                    best_move = move
+                    alpha = max(alpha, max_score)
+                    if alpha >= beta:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if is_root:
+                        self.next_move = move
 
-    if depth == 0:
-        return score_material(gs.board)
+                gs.undo_compact_move()
+            best_score = max_score
+        else:
+            min_score = 255
+            for move_index in range(count):
+                move = moves[move_index]
+                move_id += 1
+                gs.make_compact_move(move)
+                score = self.find_move_min_max_alpha_beta_improved_with_cache(gs, depth - 1, alpha, beta, ply + 1)
+                if score < min_score:
+                    min_score = score
+                    best_move = move
+                    beta = min(beta, min_score)
+                    if beta <= alpha:
+                        self.move_orderer.record_cutoff(move, depth, ply, move_id - 1)
+                        gs.undo_compact_move()
+                        break
+                    if is_root:
+                        self.next_move = move
+                gs.undo_compact_move()
+            best_score = min_score
+
+        if best_score <= alpha_original:
+            flag = CheckersCache.UPPER_BOUND
+        elif best_score >= beta_original:
+            flag = CheckersCache.LOWER_BOUND
+        else:
+            flag = CheckersCache.EXACT
+        transposition_table.store(key, depth, best_score, flag, best_move)
+        return best_score
 
-    possible_moves_extended = gs.get_all_possible_moves()
 
-    # if depth == DEPTH:
-    #     random.shuffle(possible_moves_extended)
+# The functions below search with a new Searcher and only return the best move, a compact move that
+# GameState.get_move_from_compact turns into Move objects. They answer from the default opening book and the default
+# tablebase when they have been built (see CheckersBook and CheckersTablebase), and evaluate with the default
+# evaluation weights (see CheckersEvaluation).
 
-    if gs.white_to_move:
-        max_score = -255
-        for move in possible_moves_extended:
-            gs.make_move_extended(move)
-            score = find_move_min_max(gs, depth-1)
-            if score > max_score:
-                max_score = score
-                if depth == DEPTH:
-                    next_move = move
-            gs.undo_move()
-        return max_score
-    else:
-        min_score = 255
-        for move in possible_moves_extended:
-            gs.make_move_extended(move)
-            score = find_move_min_max(gs, depth - 1)
-            if score < min_score:
-                min_score = score
-                if depth == DEPTH:
-                    next_move = move
-            gs.undo_move()
-        return min_score
+def new_default_searcher(depth=8, time_budget_ms=1000, node_budget=None):
+    return Searcher(depth, time_budget_ms, node_budget, opening_book=CheckersBook.get_default_book(),
+                    tablebase=CheckersTablebase.get_default_tablebase(),
+                    evaluation=CheckersEvaluation.get_default_evaluation())
 
 
+def find_best_move_min_max(gs, depth=8):
+    return new_default_searcher(depth).find_best_move_min_max(gs).best_move
 
 
 def find_best_move_nega_max(gs, depth=8):
-    global next_move, DEPTH, counter, current_time
-    counter = 0
-    next_move = None
-    DEPTH = depth
-    # find_move_nega_max(gs, depth, 1 if gs.white_to_move else -1)
-    current_time = time.time()
-    find_move_nega_max_alpha_beta(gs, depth, -255, 255, 1 if gs.white_to_move else -1)
-
-    print(f"possible move count: {counter}, used time: {(time.time() - current_time)}")
-    return next_move
-
-
-def find_move_nega_max(gs, depth, turn_multiplier):
-    global next_move, counter
-    counter += 1
-
-    if depth == 0:
-        return turn_multiplier * score_material(gs.board)
-
-    possible_moves_extended = gs.get_all_possible_moves()
-
-    max_score = -255
-
-    for move in possible_moves_extended:
-        gs.make_move_extended(move)
-        score = -find_move_nega_max(gs, depth-1, -turn_multiplier)
-        if score > max_score:
-            max_score = score
-            if depth == DEPTH:
-                next_move = move
-        gs.undo_move()
-    return max_score
-
-
-def find_move_nega_max_alpha_beta(gs, depth, alpha, beta, turn_multiplier):
-    global next_move, counter
-    # counter += 1
-
-    if depth == 0:
-        counter += 1
-
-        # possible_moves_extended = gs.get_all_possible_moves()
-        # if len(possible_moves_extended) == 0:
-        #     return -255
-        # if gs.is_capturing:
-        #     depth = 1
-        # else:
-        #     return turn_multiplier * score_material(gs.board)
-        return turn_multiplier * score_material(gs.board)
-
-    # move ordering - implement later
-    possible_moves_extended = gs.get_all_possible_moves()
-
-    # if depth == DEPTH:
-    #     random.shuffle(possible_moves_extended)
-
-    max_score = -255
-    m = 0
-    for move in possible_moves_extended:
-        m += 1
-        gs.make_move_extended(move)
-        score = -find_move_nega_max_alpha_beta(gs, depth-1, -beta, -alpha, -turn_multiplier)
-        if score > max_score:
-            max_score = score
-            if depth == DEPTH:
-                print(f"m: {m}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-
-                next_move = move
-        gs.undo_move()
-        if max_score > alpha:  # pruning happens
-            alpha = max_score
-        if alpha >= beta:
-            break
-    return max_score
+    return new_default_searcher(depth).find_best_move_nega_max(gs).best_move
+
+
+def find_best_move_principal_variation(gs, depth=8):
+    return new_default_searcher(depth).find_best_move_principal_variation(gs).best_move
+
+
+def find_best_move_min_max_with_cache(gs, depth=8):
+    return new_default_searcher(depth).find_best_move_min_max_with_cache(gs).best_move
+
+
+def find_best_move_iterative_deepening(gs, time_budget_ms=1000, node_budget=None, max_depth=64):
+    return new_default_searcher(max_depth, time_budget_ms, node_budget).find_best_move_iterative_deepening(gs).best_move
 
 
 # a positive score is good for white, a negative score is good for black
-# Score the board base on material
+# Score the board base on material. The search uses GameState.material_score, which has the same value.
+# CheckersBatchEval scores many positions at once.
 def score_material(board):
     score = 0
     for row in board:
@@ -318,131 +1005,3 @@ def score_material(board):
                 score -= piece_score[square[1]]
 
     return score
-
-
-
-
-
-
-
-
-
-
-move_whole_backup = list()
-move_single_backup = list()
-
-# this method has  not been implemented completely yet
-def find_move_min_max_alpha_beta_improved_with_cache(gs, depth, alpha, beta):
-    global next_move
-    global counter
-
-
-
-    # if gs.is_game_over():
-    #     print(f"GAME OVER works for {'white' if not gs.white_to_move else 'black'}")
-    #     return 255 if not gs.white_to_move else -255
-
-    if depth == 0:
-
-        counter += 1
-        # return score_material(gs.board)
-
-        possible_moves_extended = gs.get_all_possible_captures()
-        if len(possible_moves_extended) > 0:
-            depth += 1
-        else:
-            return score_material(gs.board)
-    else:
-        possible_moves_extended = gs.get_all_possible_moves()
-        if len(possible_moves_extended) == 0:
-            counter += 1
-
-            print(f"GAME ENDS AND {'black' if gs.white_to_move else 'white'} wins. Depth: {depth}")
-            return -100 if gs.white_to_move else 100
-
-    # possible_moves_extended = gs.get_all_possible_moves()
-
-    # if depth == DEPTH:
-    #     random.shuffle(possible_moves_extended)
-
-
-
-    move_id = 0
-
-    if depth == DEPTH and len(possible_moves_extended) == 1:
-        counter += 1
-        next_move = possible_moves_extended[0]
-        return
-
-
-    if gs.white_to_move:
-        max_score = -255
-        for move in possible_moves_extended:
-
-            # add move ids of related branch
-            move_id_as_tuple = tuple(CheckersEngine.get_extended_move_id_list(move))
-
-            move_single_backup.add(tuple(move_id_as_tuple))
-
-            if move_single_backup in move_whole_backup:
-                continue
-            else:
-                move_whole_backup.append(move_single_backup.copy())
-
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta)
-
-            move_single_backup.discard(move_id_as_tuple)
-
-            # print(f"Score: {score}, max_score: {max_score}, depth: {depth}, alpha: {alpha}, beta: {beta}")
-            if score > max_score:
-                max_score = score
-                alpha = max(alpha, max_score)
-                if alpha >= beta:
-                    gs.undo_move()
-                    break
-
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"turn: {'white'}, move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-
-
-            gs.undo_move()
-        return max_score
-    else:
-        min_score = 255
-        for move in possible_moves_extended:
-
-            # add move ids of related branch
-            move_id_as_tuple = tuple(CheckersEngine.get_extended_move_id_list(move))
-
-            move_single_backup.add(tuple(move_id_as_tuple))
-
-            if move_single_backup in move_whole_backup:
-                continue
-            else:
-                move_whole_backup.append(move_single_backup.copy())
-
-            move_id += 1
-            gs.make_move_extended(move)
-            score = find_move_min_max_alpha_beta_improved(gs, depth - 1, alpha, beta)
-
-
-            move_single_backup.discard(move_id_as_tuple)
-
-
-
-            if score < min_score:
-                min_score = score
-                beta = min(beta, min_score)
-                if beta <= alpha:
-                    gs.undo_move()
-                    break
-                if depth == DEPTH:
-                    next_move = move
-                    print(f"turn: {'black'}, move_id: {move_id}, counter: {counter}, score: {score}, used time: {(time.time() - current_time)}")
-                    if len(possible_moves_extended) == 1:
-                        break
-            gs.undo_move()
-        return min_score
\ No newline at end of file
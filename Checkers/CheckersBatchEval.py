@@ -0,0 +1,121 @@
+"""
+Batch evaluation of many positions with NumPy. A batch is an N x 50 int8 array, one row per position and one column
+per playable square (column n - 1 for square n), holding the piece ids of CheckersEngine.PIECE_IDS (0 for an empty
+square). A position is scored by adding up the weight of each piece on its square, so a weight table of shape
+5 x 50 (piece id x square) gives pure material (get_material_weights) or any piece-square table.
+Scores are positive for white, like CheckersAI.score_material and the search.
+
+Batches are made from snapshots, boards, or packed snapshots (see CheckersEngine.pack_snapshot). A file of packed
+snapshots is read through a memory map and scored in chunks, so files larger than memory can be scored.
+NumPy is an optional dependency of the project (see requirements-optional.txt), only this module and CheckersTuner
+need it.
+
+Usage: python CheckersBatchEval.py positions.bin --output scores.npy
+"""
+import argparse
+import time
+
+import numpy as np
+
+import CheckersEngine
+
+SQUARE_COUNT = CheckersEngine.SQUARE_COUNT
+PIECE_COUNT = len(CheckersEngine.PIECE_NAMES)
+CHUNK_SIZE = 1 << 16  # positions scored at once, bounds the size of the temporary arrays
+
+
+# Weight table of pure material: the material value of each piece on every square
+def get_material_weights():
+    return np.repeat(np.array(CheckersEngine.PIECE_MATERIAL, dtype=np.float32)[:, None], SQUARE_COUNT, axis=1)
+
+
+# Batch of snapshots (see GameState.get_snapshot). Return the board array and the side to move array.
+def encode_snapshots(snapshots):
+    square_masks = np.array([[CheckersEngine.get_square_mask(mask) for mask in snapshot[:4]] for snapshot in snapshots],
+                            dtype=np.uint64).reshape(-1, 4)
+    bits = (square_masks[:, :, None] >> np.arange(SQUARE_COUNT, dtype=np.uint64)) & np.uint64(1)
+    piece_ids = np.arange(1, 5, dtype=np.int8)[None, :, None]
+    boards = (bits.astype(np.int8) * piece_ids).sum(axis=1, dtype=np.int8)
+    white_to_move = np.array([bool(snapshot[4]) for snapshot in snapshots], dtype=bool)
+    return boards, white_to_move
+
+
+# Batch of 10x10 boards like GameState.board
+def encode_boards(boards):
+    squares = [CheckersEngine.Move.square_position_to_row_col[square] for square in range(1, SQUARE_COUNT + 1)]
+    return np.array([[CheckersEngine.PIECE_IDS[board[row][col]] for row, col in squares] for board in boards],
+                    dtype=np.int8).reshape(-1, SQUARE_COUNT)
+
+
+# Batch of packed snapshots stored one after the other in data (bytes or a uint8 array). Return the board array and
+# the side to move array.
+def encode_packed_snapshots(data):
+    records = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    if records.size % CheckersEngine.SNAPSHOT_SIZE:
+        raise ValueError(f"the data is not a whole number of {CheckersEngine.SNAPSHOT_SIZE} byte snapshots")
+    bits = np.unpackbits(records.reshape(-1, CheckersEngine.SNAPSHOT_SIZE), axis=1, bitorder="little")
+    masks = bits[:, 1:1 + 4 * SQUARE_COUNT].reshape(-1, 4, SQUARE_COUNT).astype(np.int8)
+    boards = (masks * np.arange(1, 5, dtype=np.int8)[None, :, None]).sum(axis=1, dtype=np.int8)
+    return boards, bits[:, 0].astype(bool)
+
+
+class BatchEvaluator:
+    """
+    Scores batches of positions with a weight table of shape 5 x 50: the score of a position is the sum of
+    weights[piece id, square - 1] over its pieces. The row of piece id 0 (empty squares) should be zero.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = get_material_weights() if weights is None else np.asarray(weights, dtype=np.float32)
+        if self.weights.shape != (PIECE_COUNT, SQUARE_COUNT):
+            raise ValueError(f"the weights must have the shape {(PIECE_COUNT, SQUARE_COUNT)}")
+
+    # Score an N x 50 board array, returns N float32 scores, positive is good for white
+    def evaluate(self, boards):
+        boards = np.asarray(boards)
+        scores = np.empty(len(boards), dtype=np.float32)
+        square_indices = np.arange(SQUARE_COUNT)
+        for start in range(0, len(boards), CHUNK_SIZE):
+            chunk = boards[start:start + CHUNK_SIZE]
+            scores[start:start + len(chunk)] = self.weights[chunk, square_indices].sum(axis=1)
+        return scores
+
+    def evaluate_snapshots(self, snapshots):
+        return self.evaluate(encode_snapshots(snapshots)[0])
+
+    def evaluate_boards(self, boards):
+        return self.evaluate(encode_boards(boards))
+
+    # Score a file of packed snapshots without loading it, chunk by chunk through a memory map
+    def evaluate_file(self, path):
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        record_count = data.size // CheckersEngine.SNAPSHOT_SIZE
+        if data.size != record_count * CheckersEngine.SNAPSHOT_SIZE:
+            raise ValueError(f"not a file of packed snapshots: {path}")
+        scores = np.empty(record_count, dtype=np.float32)
+        chunk_bytes = CHUNK_SIZE * CheckersEngine.SNAPSHOT_SIZE
+        for start in range(0, data.size, chunk_bytes):
+            boards = encode_packed_snapshots(np.asarray(data[start:start + chunk_bytes]))[0]
+            first = start // CheckersEngine.SNAPSHOT_SIZE
+            scores[first:first + len(boards)] = self.evaluate(boards)
+        return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a file of packed snapshots (see CheckersEngine.pack_snapshot).")
+    parser.add_argument("path")
+    parser.add_argument("--weights", help=".npy file of a 5 x 50 weight table, pure material by default")
+    parser.add_argument("--output", help=".npy file the scores are written to")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    evaluator = BatchEvaluator(np.load(args.weights) if args.weights else None)
+    scores = evaluator.evaluate_file(args.path)
+    seconds = time.time() - start_time
+    print(f"{len(scores)} positions in {seconds:.2f} s, {len(scores) / seconds if seconds else 0:.0f} positions/s")
+    if args.output:
+        np.save(args.output, scores)
+
+
+if __name__ == '__main__':
+    main()
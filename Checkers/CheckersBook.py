@@ -0,0 +1,186 @@
+"""
+Opening book. The book is built offline by deep searches from the initial position and written as a binary file of
+fixed size entries sorted by zobrist key (see GameState.zobrist_key), so a position is found by a binary search.
+The file is read through mmap: nothing is loaded up front, and every process that opens the book shares the same
+pages of the operating system's file cache instead of keeping its own copy.
+
+File format (little endian): a header of the magic bytes and the entry count, then the entries.
+An entry is the position key (uint64), the compact move (uint64, see CheckersEngine.encode_move), the score of the
+move (int16 in hundredths of a man, positive is good for white) and its weight (uint16, the depth of the search that
+chose the move).
+A position can have several entries, they are then sorted by weight, highest first.
+
+Usage: python CheckersBook.py --plies 8 --depth 7 --full-width-plies 2
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+
+import CheckersAI
+import CheckersEngine
+import CheckersEvaluation
+
+MAGIC = b"CBK2"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<QQhH")
+KEY = struct.Struct("<Q")
+SCORE_SCALE = 100  # stored scores are fixed point, the evaluation scores are fractions of a man
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+class OpeningBook:
+    """
+    A read-only opening book file mapped into memory. OpeningBook objects can be sent to worker processes, the
+    worker maps the same file again (see __getstate__).
+    """
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.entry_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.entry_count * ENTRY.size:
+            self.close()
+            raise ValueError(f"not an opening book file: {path}")
+
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __len__(self):
+        return self.entry_count
+
+    # Return the list of (move, score, weight) stored for the key, the highest weight first
+    def probe(self, key):
+        data = self.data
+        low = 0
+        high = self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.entry_count:
+            entry_key, move, score, weight = ENTRY.unpack_from(data, HEADER.size + low * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, score / SCORE_SCALE, weight))
+            low += 1
+        return entries
+
+    # Return (move, score, weight) of the book move of the position in gs, or None if the position is not in the
+    # book. The move is checked against the moves of the position, so a key collision never returns an illegal move.
+    def find_move(self, gs):
+        entries = self.probe(gs.zobrist_key)
+        if entries:
+            legal_moves = gs.get_compact_moves()
+            for entry in entries:
+                if entry[0] in legal_moves:
+                    self.hits += 1
+                    return entry
+        self.misses += 1
+        return None
+
+    def get_stats(self):
+        return {"entries": self.entry_count, "hits": self.hits, "misses": self.misses}
+
+
+# The opening book at DEFAULT_BOOK_PATH, opened once per process, or None if no book has been built
+default_book = None
+
+
+def get_default_book():
+    global default_book
+    if default_book is None and os.path.exists(DEFAULT_BOOK_PATH):
+        default_book = OpeningBook(DEFAULT_BOOK_PATH)
+    return default_book
+
+
+class BookBuilder:
+    """
+    Collects book entries and writes them to a book file. Positions are added by searching them with a Searcher,
+    a position that is added again keeps the entry of the deeper search.
+    """
+
+    def __init__(self, depth=7, tt_memory_mb=64):
+        self.depth = depth
+        self.searcher = CheckersAI.Searcher(depth, tt_memory_mb=tt_memory_mb,
+                                            evaluation=CheckersEvaluation.get_default_evaluation())
+        self.entries = {}  # zobrist key -> (move, score, weight)
+        self.searches = 0
+
+    # Search the position in gs and add its best move to the book. Return the move, or None if there is none.
+    def add_position(self, gs):
+        if gs.zobrist_key in self.entries and self.entries[gs.zobrist_key][2] >= self.depth:
+            return self.entries[gs.zobrist_key][0]
+        result = self.searcher.find_best_move_min_max_with_cache(gs, self.depth)
+        self.searches += 1
+        if result.best_move is None:
+            return None
+        score = result.score if result.score is not None else gs.material_score
+        self.entries[gs.zobrist_key] = (result.best_move, score, self.depth)
+        return result.best_move
+
+    # Add every position of the first plies moves of the game tree. In the first full_width_plies plies every move
+    # is followed, after that only the book move, so the book has an answer to every opening of the opponent.
+    def add_openings(self, gs, plies, full_width_plies=2):
+        if plies == 0:
+            return
+        book_move = self.add_position(gs)
+        if book_move is None:
+            return
+        moves = gs.get_compact_moves() if full_width_plies > 0 else [book_move]
+        for move in moves:
+            gs.make_compact_move(move)
+            self.add_openings(gs, plies - 1, full_width_plies - 1)
+            gs.undo_compact_move()
+
+    # Write the book file, sorted by key. The file is replaced at once, so readers never see a partial book.
+    def write(self, path=DEFAULT_BOOK_PATH):
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(self.entries)))
+            for key in sorted(self.entries):
+                move, score, weight = self.entries[key]
+                file.write(ENTRY.pack(key, move, max(-32768, min(32767, round(score * SCORE_SCALE))), min(weight, 65535)))
+        os.replace(temporary_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book from deep searches of the initial position.")
+    parser.add_argument("--plies", type=int, default=8, help="number of plies covered by the book")
+    parser.add_argument("--depth", type=int, default=7, help="search depth of every book position")
+    parser.add_argument("--full-width-plies", type=int, default=2,
+                        help="plies in which every move is followed instead of only the book move")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    builder = BookBuilder(args.depth)
+    builder.add_openings(CheckersEngine.BitboardGameState(), args.plies, args.full_width_plies)
+    builder.write(args.output)
+    print(f"{len(builder.entries)} positions, {builder.searches} searches in {time.time() - start_time:.1f} s, "
+          f"written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Fixed size caches for the search in CheckersAI. The caches are keyed by GameState.zobrist_key.
+"""
+
+# bound types of a transposition table entry
+EXACT = 0
+LOWER_BOUND = 1  # the real score is at least the stored score (the search failed high)
+UPPER_BOUND = 2  # the real score is at most the stored score (the search failed low)
+
+# Rough size of one entry in bytes: a slot in each of the six lists plus the key, score and move int objects
+TT_ENTRY_SIZE = 160
+# Rough size of one evaluation cache entry in bytes: a slot in each of the two lists plus the key and score objects
+EVALUATION_ENTRY_SIZE = 80
+
+
+class TranspositionTable:
+    """
+    A fixed size transposition table with a two-tier replacement scheme. Every bucket has two slots:
+    a depth-preferred slot that is only replaced by a search of at least the same depth (or by any search once the
+    entry is from an older search), and an always-replace slot that takes every other entry.
+    Entries are kept in flat lists that are allocated once, so the memory use does not grow during the search.
+    """
+
+    def __init__(self, memory_mb=16):
+        bucket_count = 1
+        while bucket_count * 4 * TT_ENTRY_SIZE <= memory_mb * 1024 * 1024:
+            bucket_count *= 2
+        self.bucket_mask = bucket_count - 1
+        self.size = bucket_count * 2
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.scores = [0] * self.size
+        self.flags = [EXACT] * self.size
+        self.moves = [None] * self.size  # compact best move, see CheckersEngine.encode_move
+        self.ages = [0] * self.size
+        self.age = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    # Call before every new search, entries of older searches can then be replaced by shallower ones
+    def new_search(self):
+        self.age += 1
+
+    def clear(self):
+        for i in range(self.size):
+            self.keys[i] = None
+            self.moves[i] = None
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.stores = self.overwrites = 0
+
+    # Return the index of the entry stored for the key, or -1 if there is none
+    def probe(self, key):
+        index = (key & self.bucket_mask) << 1
+        if self.keys[index] == key:
+            self.hits += 1
+            return index
+        if self.keys[index + 1] == key:
+            self.hits += 1
+            return index + 1
+        self.misses += 1
+        return -1
+
+    # A key is stored in at most one slot of its bucket: an entry that moves from the always-replace slot to the
+    # depth-preferred slot swaps places with the entry it replaces instead of leaving a stale copy behind.
+    def store(self, key, depth, score, flag, move):
+        index = (key & self.bucket_mask) << 1
+        keys = self.keys
+        if keys[index] != key and keys[index] is not None:
+            if self.depths[index] > depth and self.ages[index] == self.age:
+                index += 1  # keep the deeper entry, use the always-replace slot
+            elif keys[index + 1] == key:
+                self.move_entry(index, index + 1)
+
+        if keys[index] is not None and keys[index] != key:
+            self.overwrites += 1
+        self.stores += 1
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.scores[index] = score
+        self.flags[index] = flag
+        self.moves[index] = move
+        self.ages[index] = self.age
+
+    def move_entry(self, source, target):
+        self.keys[target] = self.keys[source]
+        self.depths[target] = self.depths[source]
+        self.scores[target] = self.scores[source]
+        self.flags[target] = self.flags[source]
+        self.moves[target] = self.moves[source]
+        self.ages[target] = self.ages[source]
+        self.keys[source] = None
+
+    def get_hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def get_stats(self):
+        return {"size": self.size, "hits": self.hits, "misses": self.misses, "stores": self.stores,
+                "overwrites": self.overwrites, "hit_rate": self.get_hit_rate()}
+
+
+class EvaluationCache:
+    """
+    A fixed size, direct-mapped cache of static evaluations. Each key has exactly one slot and a new entry replaces
+    whatever is in it, so a probe is a single comparison. The full key is stored, so a score is only returned for the
+    position it was computed for.
+    """
+
+    def __init__(self, memory_mb=4):
+        size = 1
+        while size * 2 * EVALUATION_ENTRY_SIZE <= memory_mb * 1024 * 1024:
+            size *= 2
+        self.mask = size - 1
+        self.size = size
+        self.keys = [None] * size
+        self.scores = [0] * size
+
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def clear(self):
+        for i in range(self.size):
+            self.keys[i] = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.overwrites = 0
+
+    # Return the score stored for the key, or None if there is none
+    def probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, score):
+        index = key & self.mask
+        if self.keys[index] is not None:
+            self.overwrites += 1
+        self.keys[index] = key
+        self.scores[index] = score
+
+    def get_hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def get_stats(self):
+        return {"size": self.size, "hits": self.hits, "misses": self.misses, "overwrites": self.overwrites,
+                "hit_rate": self.get_hit_rate()}
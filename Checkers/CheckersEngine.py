@@ -2,8 +2,22 @@
 This class is responsible for storing all the information about the current state of a chess game. It will also be
 responsible for determining the valid moves at the current state. It will also keep a move log.
 """
+import random
 from typing import List
 
+# Zobrist keys: one random 64-bit number per (piece, square) and one for black to move. The position key is the
+# xor of the keys of all pieces on the board, so it can be updated in O(1) when a piece moves or is captured.
+# A fixed seed makes the keys identical in every process, so keys can be stored in files and shared by workers.
+ZOBRIST_SEED = 20220131
+_zobrist_random = random.Random(ZOBRIST_SEED)
+ZOBRIST_PIECE_KEYS = {piece: [_zobrist_random.getrandbits(64) for _ in range(100)]  # indexed by row * 10 + col
+                      for piece in ("wm", "bm", "wk", "bk")}
+ZOBRIST_PIECE_KEYS["--"] = [0] * 100
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+# Material value of each piece, positive for white (the same values as CheckersAI.piece_score)
+MATERIAL_SCORES = {"wm": 1, "bm": -1, "wk": 3, "bk": -3, "--": 0}
+
 
 # Get a given data from a dictionary with position provided as a list
 def nested_get(dic, keys):
@@ -112,20 +126,121 @@ class GameState:
         #     ["wm", "--", "wm", "--", "wm", "--", "--", "--", "--", "--"]
         # ]
         self.move_functions = {'m': self.get_man_moves, 'k': self.get_king_moves}
-        self.capture_functions = {'m': self.get_man_captures, 'k': self.get_king_captures}
 
         self.white_to_move = True
         self.move_log = []
+        self.compact_move_log = []  # moves made by make_compact_move, see undo_compact_move
         self.is_capturing = False
         self.capture_index = 0
-
+        self.zobrist_key = self.compute_zobrist_key()
+        self.piece_counts = {}
+        self.material_score = 0
+        self.count_material()
+
+    # Count the pieces and the material score from scratch, make_move, undo_move and change_turn keep them up to date,
+    # so the material of a position can be read in O(1) from self.piece_counts and self.material_score
+    def count_material(self):
+        self.piece_counts = {"wm": 0, "bm": 0, "wk": 0, "bk": 0}
+        for row in self.board:
+            for square in row:
+                if square != "--":
+                    self.piece_counts[square] += 1
+        self.material_score = sum(MATERIAL_SCORES[piece] * count for piece, count in self.piece_counts.items())
+
+    # Compute the zobrist key of the position from scratch, make_move, undo_move and change_turn keep it up to date
+    def compute_zobrist_key(self):
+        key = 0 if self.white_to_move else ZOBRIST_BLACK_TO_MOVE
+        for row in range(len(self.board)):
+            for col in range(len(self.board[row])):
+                key ^= ZOBRIST_PIECE_KEYS[self.board[row][col]][row * 10 + col]
+        return key
+
+    # Compact copy of the position: the piece bitmasks (white men, black men, white kings, black kings, in the layout
+    # of BitboardGameState) and the side to move. The move log is not part of the snapshot.
+    def get_snapshot(self):
+        masks = [0, 0, 0, 0, 0]
+        for bit in iterate_bits(BOARD_MASK):
+            row, col = BIT_TO_ROW_COL[bit]
+            masks[PIECE_IDS[self.board[row][col]]] |= 1 << bit
+        return masks[1], masks[2], masks[3], masks[4], self.white_to_move
+
+    # Replace the position with the one of a snapshot made by get_snapshot
+    def load_snapshot(self, snapshot):
+        board = [["--"] * 10 for _ in range(10)]
+        for piece, mask in zip(("wm", "bm", "wk", "bk"), snapshot[:4]):
+            for bit in iterate_bits(mask):
+                row, col = BIT_TO_ROW_COL[bit]
+                board[row][col] = piece
+        self.set_board(board, snapshot[4])
+
+    # Replace the position with a copy of board (a 10x10 list like self.board) and clear the move log
+    def set_board(self, board, white_to_move=True):
+        self.board = [list(row) for row in board]
+        self.white_to_move = white_to_move
+        self.valid_moves = []
+        self.single_valid_moves = []
+        self.move_log = []
+        self.compact_move_log = []
+        self.is_capturing = False
+        self.capture_index = 0
+        self.zobrist_key = self.compute_zobrist_key()
+        self.count_material()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        gs = cls()
+        gs.load_snapshot(snapshot)
+        return gs
+
+    # The position in draughts FEN, e.g. "W:W31,32,K45:B1,2,K10" (see snapshot_to_fen)
+    def get_fen(self):
+        return snapshot_to_fen(self.get_snapshot())
+
+    # Replace the position with the one of a draughts FEN string and clear the move log
+    def load_fen(self, fen):
+        self.load_snapshot(fen_to_snapshot(fen))
+
+    @classmethod
+    def from_fen(cls, fen):
+        gs = cls()
+        gs.load_fen(fen)
+        return gs
+
+    # The compact moves played so far, one per turn. Moves made with make_move (the UI) are read from move_log, where
+    # a capture sequence is one Move per captured piece, moves made with make_compact_move from compact_move_log.
+    def get_move_history(self):
+        if not self.move_log:
+            return list(self.compact_move_log)
+        history = []
+        turn = []
+        for move in self.move_log:
+            if turn and move.is_white != turn[0].is_white:
+                history.append(encode_move(turn if turn[0].captured_piece_pos is not None else turn[0]))
+                turn = []
+            turn.append(move)
+        history.append(encode_move(turn if turn[0].captured_piece_pos is not None else turn[0]))
+        return history
+
+    # The snapshot of the position packed into SNAPSHOT_SIZE bytes (see pack_snapshot)
+    def get_packed_snapshot(self):
+        return pack_snapshot(self.get_snapshot())
+
+    @classmethod
+    def from_packed_snapshot(cls, data, offset=0):
+        return cls.from_snapshot(unpack_snapshot(data, offset))
 
     def make_move(self, move, seaching_mode=False):
         self.board[move.start_row][move.start_col] = "--"
         self.board[move.end_row][move.end_col] = move.piece_moved
+        piece_keys = ZOBRIST_PIECE_KEYS[move.piece_moved]
+        self.zobrist_key ^= piece_keys[move.start_row * 10 + move.start_col] ^ \
+            piece_keys[move.end_row * 10 + move.end_col]
         if move.captured_piece != "--":
             row, col = move.captured_piece_pos
             self.board[row][col] = "--"
+            self.zobrist_key ^= ZOBRIST_PIECE_KEYS[move.captured_piece][row * 10 + col]
+            self.piece_counts[move.captured_piece] -= 1
+            self.material_score -= MATERIAL_SCORES[move.captured_piece]
         self.move_log.append(move)  # log the move so we can undo it later
 
         if not seaching_mode:
@@ -150,16 +265,77 @@ class GameState:
 
 
 
+    # Compact moves (see encode_move) for the search. This class still builds them from the Move objects (and lists)
+    # of get_all_possible_moves, so it allocates at every node; only BitboardGameState generates them directly
+    # without creating any Move.
+    # Write the moves (only the captures if captures_only is set) to buffer[0:count] and return count. The buffer is
+    # reused by the caller, it is only extended when it is too short.
+    def generate_moves(self, buffer, captures_only=False):
+        moves = self.get_all_possible_captures() if captures_only else self.get_all_possible_moves()
+        count = 0
+        for move in moves:
+            if count < len(buffer):
+                buffer[count] = encode_move(move)
+            else:
+                buffer.append(encode_move(move))
+            count += 1
+        return count
+
+    def get_compact_moves(self, captures_only=False):
+        buffer = []
+        count = self.generate_moves(buffer, captures_only)
+        return buffer[:count]
+
+    # Make a whole move (a quiet move or a capture sequence) given as a compact move and change the turn
+    def make_compact_move(self, move):
+        self.make_move_extended(self.get_move_from_compact(move))
+        self.compact_move_log.append(move)
+
+    # Undo the last move made by make_compact_move
+    def undo_compact_move(self):
+        self.compact_move_log.pop()
+        self.undo_move()
+
+    # The Move (or the list of Move of a capture sequence) of a compact move of the current position
+    def get_move_from_compact(self, move):
+        if not move & CAPTURE_FLAG:
+            return Move(BIT_TO_ROW_COL[move & SQUARE_MASK], BIT_TO_ROW_COL[move >> END_SHIFT & SQUARE_MASK],
+                        self.board, self.white_to_move)
+        first_row, first_col = BIT_TO_ROW_COL[move & SQUARE_MASK]
+        piece_moved = self.board[first_row][first_col]
+        moves = []
+        while move:
+            captured_pos = BIT_TO_ROW_COL[move >> CAPTURED_SHIFT & SQUARE_MASK]
+            moves.append(Move(BIT_TO_ROW_COL[move & SQUARE_MASK], BIT_TO_ROW_COL[move >> END_SHIFT & SQUARE_MASK],
+                              self.board, self.white_to_move,
+                              captured_piece=self.board[captured_pos[0]][captured_pos[1]],
+                              captured_piece_pos=captured_pos, piece_moved=piece_moved))
+            move >>= STEP_BITS
+        return moves
+
     # Undo the last move made
     def undo_move(self, only_one=False):
         if len(self.move_log):  # make sure that there is a move to undo
 
             while(True):
                 move = self.move_log.pop()
+                # the piece on the end square may have been promoted in the meantime
+                end_index = move.end_row * 10 + move.end_col
+                end_piece = self.board[move.end_row][move.end_col]
+                self.zobrist_key ^= ZOBRIST_PIECE_KEYS[end_piece][end_index] ^ \
+                    ZOBRIST_PIECE_KEYS[move.piece_moved][move.start_row * 10 + move.start_col]
+                if end_piece != move.piece_moved:
+                    self.piece_counts[end_piece] -= 1
+                    self.piece_counts[move.piece_moved] += 1
+                    self.material_score += MATERIAL_SCORES[move.piece_moved] - MATERIAL_SCORES[end_piece]
                 self.board[move.start_row][move.start_col] = move.piece_moved
                 self.board[move.end_row][move.end_col] = "--"
                 if move.captured_piece != "--":
                     self.board[move.captured_piece_pos[0]][move.captured_piece_pos[1]] = move.captured_piece
+                    self.zobrist_key ^= ZOBRIST_PIECE_KEYS[move.captured_piece][move.captured_piece_pos[0] * 10 +
+                                                                               move.captured_piece_pos[1]]
+                    self.piece_counts[move.captured_piece] += 1
+                    self.material_score += MATERIAL_SCORES[move.captured_piece]
 
                 if only_one:
                     return
@@ -169,6 +345,7 @@ class GameState:
 
             if (self.capture_index > 1):
                 self.white_to_move = not self.white_to_move
+                self.zobrist_key ^= ZOBRIST_BLACK_TO_MOVE
             self.change_turn()
 
     # All moves considering rules (for e., the move that captures the greatest number of pieces must be made.)
@@ -197,45 +374,36 @@ class GameState:
 
     # All moves without considering rules
     def get_all_possible_moves(self):
+        moves_with_captures = self.get_all_possible_captures()
+        if len(moves_with_captures) != 0:
+            return moves_with_captures
+
         moves = []
-        moves_with_captures = []
         for row in range(len(self.board)):  # number of rows
             for col in range(len(self.board[row])):  # number of cols in given row
                 turn = self.board[row][col][0]
                 if turn == "w" and self.white_to_move or turn == "b" and not self.white_to_move:
                     piece = self.board[row][col][1]
-                    self.capture_functions[piece](row, col, moves_with_captures)
                     self.move_functions[piece](row, col, moves)
-
-        if len(moves_with_captures) != 0:
-            return moves_with_captures
-
         return moves
 
     def get_all_possible_captures(self):
-        # moves = []
-        moves_with_captures = []
-        for row in range(len(self.board)):  # number of rows
-            for col in range(len(self.board[row])):  # number of cols in given row
-                turn = self.board[row][col][0]
-                if turn == "w" and self.white_to_move or turn == "b" and not self.white_to_move:
-                    piece = self.board[row][col][1]
-                    self.capture_functions[piece](row, col, moves_with_captures)
-                    # self.move_functions[piece](row, col, moves)
-
-        # if len(moves_with_captures) != 0:
-        #     return moves_with_captures
-
-        return moves_with_captures
+        men, kings, enemy, enemy_kings, empty = self.get_capture_masks()
+        buffer = []
+        count = generate_capture_sequences(men | kings, kings, enemy, enemy_kings, empty, buffer)
+        if count:
+            self.is_capturing = True
+        return [self.get_move_from_compact(buffer[index]) for index in range(count)]
 
     def is_game_over(self):
+        if self.can_capture():
+            return False
         any_move = []
         for row in range(len(self.board)):  # number of rows
             for col in range(len(self.board[row])):  # number of cols in given row
                 turn = self.board[row][col][0]
                 if turn == "w" and self.white_to_move or turn == "b" and not self.white_to_move:
                     piece = self.board[row][col][1]
-                    self.capture_functions[piece](row, col, any_move)
                     self.move_functions[piece](row, col, any_move)
 
                     if len(any_move) != 0:
@@ -243,17 +411,21 @@ class GameState:
         return True
 
     def can_capture(self):
-        any_capture = []
-        for row in range(len(self.board)):  # number of rows
-            for col in range(len(self.board[row])):  # number of cols in given row
-                turn = self.board[row][col][0]
-                if turn == "w" and self.white_to_move or turn == "b" and not self.white_to_move:
-                    piece = self.board[row][col][1]
-                    self.capture_functions[piece](row, col, any_capture)
-                    if len(any_capture) != 0:
-                        return True
+        men, kings, enemy, enemy_kings, empty = self.get_capture_masks()
+        if has_capture(men, kings, enemy, empty):
+            self.is_capturing = True
+            return True
         return False
 
+    # Bitmasks (see BitboardGameState) of the men and kings of the side to move, of all enemy pieces, of the enemy
+    # kings and of the empty squares. generate_capture_sequences works on these copies and never on self.board.
+    def get_capture_masks(self):
+        white_men, black_men, white_kings, black_kings, _ = GameState.get_snapshot(self)
+        empty = BOARD_MASK & ~(white_men | black_men | white_kings | black_kings)
+        if self.white_to_move:
+            return white_men, white_kings, black_men | black_kings, black_kings, empty
+        return black_men, black_kings, white_men | white_kings, white_kings, empty
+
     def can_move(self):
         any_move = []
         for row in range(len(self.board)):  # number of rows
@@ -278,33 +450,6 @@ class GameState:
             if self.is_on_board(end_row, end_col) and self.board[end_row][end_col] == "--":
                 moves.append(Move((row, col), (end_row, end_col), self.board, self.white_to_move))
 
-    def get_man_captures(self, row, col, moves_with_captures, enemy_color=None, found_capture_list=[]):
-        directions = self.get_capture_directions()
-        if enemy_color is None:
-            enemy_color = "b" if self.white_to_move else "w"
-        any_found = False
-        for d in directions:
-            end_row = row + 2 * d[0]
-            end_col = col + 2 * d[1]
-            if self.is_on_board(end_row, end_col) and self.board[end_row][end_col] == "--":
-                next_row = row + d[0]
-                next_col = col + d[1]
-                piece = self.board[next_row][next_col]
-                if piece[0] == enemy_color:
-                    any_found = True
-                    self.is_capturing = True
-                    tmp_move = Move((row, col), (end_row, end_col), self.board, self.white_to_move,
-                                    captured_piece=piece, captured_piece_pos=(next_row, next_col))
-                    found_capture_list.append(tmp_move)
-                    self.make_move(tmp_move, seaching_mode=True)
-                    self.get_man_captures(end_row, end_col, moves_with_captures,
-                                          enemy_color=enemy_color, found_capture_list=found_capture_list)
-                    found_capture_list.pop()
-                    self.undo_move(only_one=True)
-
-
-        self.add_in_moves_with_captures(any_found, found_capture_list, moves_with_captures)
-
     # Get all the king moves for the king located at row, col and add these moves to the list
     def get_king_moves(self, row, col, moves):
         directions = self.get_move_directions(self.board[row][col])
@@ -321,73 +466,27 @@ class GameState:
                 else:
                     break
 
-    def get_king_captures(self, row, col, moves_with_captures, enemy_color=None, found_capture_list=[]):
-        directions = self.get_capture_directions()
-        if enemy_color is None:
-            enemy_color = "b" if self.white_to_move else "w"
-        any_found = False
-        for d in directions:
-            for i in range(1, 9):
-                capture_pos = ((row + d[0] * i), (col + d[1] * i))
-                if self.is_on_board(capture_pos[0], capture_pos[1]):
-                    piece = self.board[capture_pos[0]][capture_pos[1]]
-                    if piece == "--":
-                        continue
-                    elif piece[0] == enemy_color:
-                        for j in range(i + 1, 10):
-                            end_row = row + d[0] * j
-                            end_col = col + d[1] * j
-                            if self.is_on_board(end_row, end_col) and self.board[end_row][end_col] == "--":
-                                any_found = True
-                                self.is_capturing = True
-
-                                tmp_move = Move((row, col), (end_row, end_col), self.board, self.white_to_move, captured_piece=piece, captured_piece_pos=capture_pos)
-                                found_capture_list.append(tmp_move)
-                                self.make_move(tmp_move, seaching_mode=True)
-                                self.get_king_captures(end_row, end_col, moves_with_captures, enemy_color=enemy_color,
-                                                       found_capture_list=found_capture_list)
-                                found_capture_list.pop()
-                                self.undo_move(True)
-
-                            else:
-                                break
-                        break
-                    else:
-                        break
-
-                else:
-                    break
-
-
-
-        self.add_in_moves_with_captures(any_found, found_capture_list, moves_with_captures)
-
-
-
     def change_turn(self):
         self.capture_index = 0
         self.valid_moves = None
         self.is_capturing = False
         self.white_to_move = not self.white_to_move  # switch turns
+        self.zobrist_key ^= ZOBRIST_BLACK_TO_MOVE
 
         # man promotion to king
         if len(self.move_log):
             last_move = self.move_log[-1]
             if last_move.is_man_promotion:
-                self.board[last_move.end_row][last_move.end_col] = last_move.piece_moved[0] + "k"
-
-
-    @staticmethod
-    def add_in_moves_with_captures(any_found, found_capture_list, moves_with_captures):
-        if not any_found and len(found_capture_list) > 0:
-            if len(moves_with_captures) == 0:
-                moves_with_captures.append(found_capture_list.copy())
-            elif len(moves_with_captures[0]) < len(found_capture_list):
-                moves_with_captures.clear()
-                moves_with_captures.append(found_capture_list.copy())
-            elif len(moves_with_captures[0]) == len(found_capture_list):
-                moves_with_captures.append(found_capture_list.copy())
-
+                king = last_move.piece_moved[0] + "k"
+                # change_turn is also called by undo_move, when the piece may already be a king
+                if self.board[last_move.end_row][last_move.end_col] != king:
+                    end_index = last_move.end_row * 10 + last_move.end_col
+                    self.zobrist_key ^= ZOBRIST_PIECE_KEYS[last_move.piece_moved][end_index] ^ \
+                        ZOBRIST_PIECE_KEYS[king][end_index]
+                    self.piece_counts[last_move.piece_moved] -= 1
+                    self.piece_counts[king] += 1
+                    self.material_score += MATERIAL_SCORES[king] - MATERIAL_SCORES[last_move.piece_moved]
+                self.board[last_move.end_row][last_move.end_col] = king
 
 
     @staticmethod
@@ -418,6 +517,9 @@ class GameState:
 
 # Takes a move as a parameter and executes it.
 class Move:
+    __slots__ = ("start_row", "start_col", "end_row", "end_col", "piece_moved", "captured_piece",
+                 "captured_piece_pos", "move_id", "is_man_promotion", "is_white")
+
     dimension = 10  # make this variable static constant in a python file which stores constant variables
     square_position_to_row_col = {}
     row_col_to_square_position = {}
@@ -429,17 +531,18 @@ class Move:
                 row_col_to_square_position[(row, col)] = pos
                 pos += 1
 
-    def __init__(self, start_sq, end_sq, board, is_white, captured_piece="--", captured_piece_pos=None):
+    def __init__(self, start_sq, end_sq, board, is_white, captured_piece="--", captured_piece_pos=None,
+                 piece_moved=None):
         self.start_row = start_sq[0]
         self.start_col = start_sq[1]
         self.end_row = end_sq[0]
         self.end_col = end_sq[1]
-        self.piece_moved = board[self.start_row][self.start_col]
+        # piece_moved can be given for the later steps of a capture sequence, when the board itself
+        # still holds the piece on the square where the sequence started
+        self.piece_moved = board[self.start_row][self.start_col] if piece_moved is None else piece_moved
         self.captured_piece = captured_piece
         self.captured_piece_pos = captured_piece_pos
 
-        self.move_id = get_piece_id(captured_piece) * 10000 + self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
-
         self.move_id = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
 
         self.is_man_promotion = self.piece_moved == "wm" and self.end_row == 0 or \
@@ -473,3 +576,535 @@ class Move:
     def __str__(self):
         return f"({self.start_row}, {self.start_col}) -> ({self.end_row}, {self.end_col}),  " \
                f"x({self.captured_piece})"
+
+
+
+"""
+Bitboard representation of the 50 playable squares.
+
+Square n (1-50, see Move.square_position_to_row_col) is stored in bit n - 1 + (n - 1) // 10, i.e. one unused
+"ghost" bit is left after every two rows. With this layout every diagonal step is a constant shift
+(up-left: -6, up-right: -5, down-left: +5, down-right: +6) and a step off the board always lands on a ghost
+bit or outside of BOARD_MASK, so whole sets of pieces can be moved with a single shift and mask.
+"""
+BIT_COUNT = 54
+BOARD_MASK = 0
+BIT_TO_ROW_COL = [None] * BIT_COUNT
+ROW_COL_TO_BIT = [-1] * 100  # indexed by row * 10 + col
+for _square, (_row, _col) in Move.square_position_to_row_col.items():
+    _bit = _square - 1 + (_square - 1) // 10
+    BOARD_MASK |= 1 << _bit
+    BIT_TO_ROW_COL[_bit] = (_row, _col)
+    ROW_COL_TO_BIT[_row * 10 + _col] = _bit
+
+# same order as GameState.get_capture_directions(): up-left, up-right, down-left, down-right
+BITBOARD_SHIFTS = (-6, -5, 5, 6)
+WHITE_MAN_SHIFTS = (-6, -5)
+BLACK_MAN_SHIFTS = (5, 6)
+
+# index of each piece in BitboardGameState.piece_masks, the same ids as get_piece_id()
+PIECE_IDS = {"--": 0, "wm": 1, "bm": 2, "wk": 3, "bk": 4}
+
+
+def shift_mask(mask, shift):
+    return mask << shift if shift > 0 else mask >> -shift
+
+
+def iterate_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+PIECE_NAMES = ("--", "wm", "bm", "wk", "bk")  # indexed by the ids of PIECE_IDS
+PIECE_MATERIAL = [MATERIAL_SCORES[piece] for piece in PIECE_NAMES]
+# zobrist key of each piece id on each bit, and the squares where the men of each piece id are promoted
+ZOBRIST_BIT_KEYS = [[0] * BIT_COUNT for _ in PIECE_NAMES]
+PROMOTION_MASKS = [0, 0, 0, 0, 0]
+for _bit in iterate_bits(BOARD_MASK):
+    _row, _col = BIT_TO_ROW_COL[_bit]
+    for _piece_id, _piece in enumerate(PIECE_NAMES):
+        ZOBRIST_BIT_KEYS[_piece_id][_bit] = ZOBRIST_PIECE_KEYS[_piece][_row * 10 + _col]
+    if _row == 0:
+        PROMOTION_MASKS[PIECE_IDS["wm"]] |= 1 << _bit
+    elif _row == 9:
+        PROMOTION_MASKS[PIECE_IDS["bm"]] |= 1 << _bit
+
+"""
+Position serialization. A position is written as draughts FEN or packed into a binary snapshot, both use the
+square numbers 1-50 of Move.square_position_to_row_col (squares 1-20 are the starting squares of black).
+
+FEN is the notation of the PDN standard: the side to move, then the white and the black pieces, each list prefixed
+with its colour, kings prefixed with K, e.g. "W:W31,32,K45:B1,2,K10". Ranges like "31-50" are accepted on input.
+
+A packed snapshot is SNAPSHOT_SIZE bytes, little endian: the side to move in bit 0 (1 for white), then 50 bits per
+mask of white men, black men, white kings and black kings, bit n - 1 for square n. Packed snapshots have a fixed
+size, so many positions can be stored one after the other and read back with the offset of unpack_snapshot.
+"""
+SQUARE_COUNT = 50
+SNAPSHOT_SIZE = (4 * SQUARE_COUNT + 1 + 7) // 8
+
+
+def get_square_of_bit(bit):
+    return bit - bit // 11 + 1
+
+
+def get_bit_of_square(square):
+    return square - 1 + (square - 1) // 10
+
+
+# The mask of the squares (bit n - 1 for square n) of a piece mask in the bitboard layout, and back.
+# The bitboard layout keeps the squares in groups of 10 bits, one ghost bit after each group.
+def get_square_mask(mask):
+    square_mask = 0
+    for group in range(SQUARE_COUNT // 10):
+        square_mask |= ((mask >> 11 * group) & 1023) << 10 * group
+    return square_mask
+
+
+def get_bitboard_mask(square_mask):
+    mask = 0
+    for group in range(SQUARE_COUNT // 10):
+        mask |= ((square_mask >> 10 * group) & 1023) << 11 * group
+    return mask
+
+
+def pack_snapshot(snapshot):
+    value = 1 if snapshot[4] else 0
+    for index in range(4):
+        value |= get_square_mask(snapshot[index]) << (1 + SQUARE_COUNT * index)
+    return value.to_bytes(SNAPSHOT_SIZE, "little")
+
+
+def unpack_snapshot(data, offset=0):
+    if len(data) < offset + SNAPSHOT_SIZE:
+        raise ValueError(f"a packed snapshot needs {SNAPSHOT_SIZE} bytes")
+    value = int.from_bytes(data[offset:offset + SNAPSHOT_SIZE], "little")
+    square_masks = [(value >> (1 + SQUARE_COUNT * index)) & ((1 << SQUARE_COUNT) - 1) for index in range(4)]
+    if value >> (1 + 4 * SQUARE_COUNT):
+        raise ValueError("unused bits of a packed snapshot are set")
+    return tuple(get_bitboard_mask(square_mask) for square_mask in square_masks) + (bool(value & 1),)
+
+
+def snapshot_to_fen(snapshot):
+    fields = ["W" if snapshot[4] else "B"]
+    for colour, man_mask, king_mask in (("W", snapshot[0], snapshot[2]), ("B", snapshot[1], snapshot[3])):
+        pieces = [(get_square_of_bit(bit), "") for bit in iterate_bits(man_mask)]
+        pieces += [(get_square_of_bit(bit), "K") for bit in iterate_bits(king_mask)]
+        fields.append(colour + ",".join(f"{prefix}{square}" for square, prefix in sorted(pieces)))
+    return ":".join(fields)
+
+
+# Parse a draughts FEN string into a snapshot (see GameState.get_snapshot). A surrounding PDN tag
+# ([FEN "..."]), quotes and a final "." are ignored. Raise ValueError if the string is not a valid position.
+def fen_to_snapshot(fen):
+    text = fen.strip()
+    if text.startswith("[FEN"):
+        text = text[4:].rstrip("]").strip()
+    text = text.strip('"').rstrip(".").replace(" ", "")
+    fields = text.split(":")
+    if fields[0].upper() not in ("W", "B"):
+        raise ValueError(f"the side to move of a FEN must be W or B: {fen}")
+    masks = [0, 0, 0, 0, 0]
+    for field in fields[1:]:
+        if not field:
+            continue
+        colour = field[0].upper()
+        if colour not in ("W", "B"):
+            raise ValueError(f"a FEN piece list must start with W or B: {fen}")
+        for item in field[1:].split(","):
+            if not item:
+                continue
+            piece_id = PIECE_IDS["wm"] if colour == "W" else PIECE_IDS["bm"]
+            if item[0].upper() == "K":
+                piece_id += 2  # the king of the same colour
+                item = item[1:]
+            first, _, last = item.partition("-")
+            try:
+                squares = range(int(first), int(last or first) + 1)
+            except ValueError:
+                raise ValueError(f"invalid square in FEN: {item}") from None
+            for square in squares:
+                if not 1 <= square <= SQUARE_COUNT:
+                    raise ValueError(f"square out of range in FEN: {square}")
+                bit = 1 << get_bit_of_square(square)
+                if (masks[1] | masks[2] | masks[3] | masks[4]) & bit:
+                    raise ValueError(f"square {square} is given twice in FEN: {fen}")
+                masks[piece_id] |= bit
+    return masks[1], masks[2], masks[3], masks[4], fields[0].upper() == "W"
+
+
+"""
+Compact moves. The search passes moves around as plain integers instead of Move objects:
+a quiet move is start_bit | end_bit << 6, a capture sequence packs one STEP_BITS wide step per captured piece,
+the first step in the lowest bits. A step is start_bit | end_bit << 6 | captured_bit << 12 | CAPTURE_FLAG, plus
+CAPTURED_KING_FLAG when the captured piece is a king. Every step is non-zero, so the steps of a sequence can be
+read back until the remaining integer is 0. Compact moves are hashable and compare by value, so they are also the
+keys of the move ordering tables and the moves stored in the transposition table.
+"""
+SQUARE_MASK = 63
+END_SHIFT = 6
+CAPTURED_SHIFT = 12
+CAPTURE_FLAG = 1 << 18
+CAPTURED_KING_FLAG = 1 << 19
+STEP_BITS = 20
+
+
+# The compact move of a Move, or of a list of Move for a capture sequence
+def encode_move(single_move_or_move_list):
+    if type(single_move_or_move_list) is not list:
+        return ROW_COL_TO_BIT[single_move_or_move_list.start_row * 10 + single_move_or_move_list.start_col] | \
+            ROW_COL_TO_BIT[single_move_or_move_list.end_row * 10 + single_move_or_move_list.end_col] << END_SHIFT
+    compact_move = 0
+    for index, move in enumerate(single_move_or_move_list):
+        row, col = move.captured_piece_pos
+        step = ROW_COL_TO_BIT[move.start_row * 10 + move.start_col] | \
+            ROW_COL_TO_BIT[move.end_row * 10 + move.end_col] << END_SHIFT | \
+            ROW_COL_TO_BIT[row * 10 + col] << CAPTURED_SHIFT | CAPTURE_FLAG
+        if move.captured_piece[1] == "k":
+            step |= CAPTURED_KING_FLAG
+        compact_move |= step << (index * STEP_BITS)
+    return compact_move
+
+
+# True if any man of men or king of kings can capture a piece of enemy
+def has_capture(men, kings, enemy, empty):
+    for shift in BITBOARD_SHIFTS:
+        if shift_mask(shift_mask(men, shift) & enemy, shift) & empty:
+            return True
+    for bit in iterate_bits(kings):
+        for shift in BITBOARD_SHIFTS:
+            square = bit + shift
+            while square >= 0 and (empty >> square) & 1:
+                square += shift
+            if square >= 0 and (enemy >> square) & 1:
+                square += shift
+                if square >= 0 and (empty >> square) & 1:
+                    return True
+    return False
+
+
+# Write the capture sequences of the pieces on the bits of pieces to buffer[0:count] as compact moves and return
+# count. Only the longest sequences of all pieces are kept (the majority capture rule), and captured pieces are
+# removed immediately (they cannot be jumped twice and free their square at once).
+# The search works on the given masks with an explicit stack of partial sequences, it does not touch any GameState
+# and keeps no state between calls, so it can run in several threads at the same time.
+def generate_capture_sequences(pieces, kings, enemy, enemy_kings, empty, buffer):
+    count = 0
+    longest = 0
+    stack = []
+    for start in iterate_bits(pieces):
+        is_king = (kings >> start) & 1
+        # a partial sequence: the square of the piece, the enemy pieces and empty squares left, the steps so far and
+        # the position of the next step in the compact move
+        stack.append((start, enemy, empty, 0, 0))
+        while stack:
+            bit, enemy_left, empty_left, move, step_shift = stack.pop()
+            continuations = []
+            for shift in BITBOARD_SHIFTS:
+                captured = bit + shift
+                if is_king:
+                    while captured >= 0 and (empty_left >> captured) & 1:
+                        captured += shift
+                if captured < 0 or not (enemy_left >> captured) & 1:
+                    continue
+                step = bit | captured << CAPTURED_SHIFT | CAPTURE_FLAG
+                if (enemy_kings >> captured) & 1:
+                    step |= CAPTURED_KING_FLAG
+                end = captured + shift
+                while end >= 0 and (empty_left >> end) & 1:
+                    continuations.append((end, enemy_left & ~(1 << captured),
+                                          (empty_left | (1 << bit) | (1 << captured)) & ~(1 << end),
+                                          move | (step | end << END_SHIFT) << step_shift, step_shift + STEP_BITS))
+                    if not is_king:
+                        break
+                    end += shift
+
+            if continuations:
+                # pushed in reverse, so the sequences are found in the order of a depth first search
+                continuations.reverse()
+                stack.extend(continuations)
+            elif step_shift:
+                length = step_shift // STEP_BITS
+                if length > longest:
+                    longest = length
+                    count = 0
+                if length == longest:
+                    if count < len(buffer):
+                        buffer[count] = move
+                    else:
+                        buffer.append(move)
+                    count += 1
+    return count
+
+
+# The moves of the position given by the piece masks (indexed by piece id, see PIECE_IDS) as compact moves, in the
+# same way as GameState.generate_moves. Only the masks are read, so any position can be examined without a GameState.
+def generate_bitboard_moves(masks, white_to_move, buffer, captures_only=False):
+    if white_to_move:
+        men, kings, enemy, enemy_kings = masks[1], masks[3], masks[2] | masks[4], masks[4]
+    else:
+        men, kings, enemy, enemy_kings = masks[2], masks[4], masks[1] | masks[3], masks[3]
+    empty = BOARD_MASK & ~(masks[1] | masks[2] | masks[3] | masks[4])
+    if has_capture(men, kings, enemy, empty):
+        return generate_capture_sequences(men | kings, kings, enemy, enemy_kings, empty, buffer)
+    if captures_only:
+        return 0
+
+    count = 0
+    man_shifts = WHITE_MAN_SHIFTS if white_to_move else BLACK_MAN_SHIFTS
+    for bit in iterate_bits(men | kings):
+        if (men >> bit) & 1:
+            for shift in man_shifts:
+                end = bit + shift
+                if end >= 0 and (empty >> end) & 1:
+                    if count < len(buffer):
+                        buffer[count] = bit | end << END_SHIFT
+                    else:
+                        buffer.append(bit | end << END_SHIFT)
+                    count += 1
+        else:
+            for shift in BITBOARD_SHIFTS:
+                end = bit + shift
+                while end >= 0 and (empty >> end) & 1:
+                    if count < len(buffer):
+                        buffer[count] = bit | end << END_SHIFT
+                    else:
+                        buffer.append(bit | end << END_SHIFT)
+                    count += 1
+                    end += shift
+    return count
+
+
+# A new list of piece masks: masks after the side to move played the compact move, including the promotion of a man
+def get_masks_after_move(masks, white_to_move, move):
+    masks = masks.copy()
+    man_id = 1 if white_to_move else 2
+    enemy_man_id = 3 - man_id
+    start = move & SQUARE_MASK
+    piece_id = man_id if (masks[man_id] >> start) & 1 else man_id + 2
+    if move & CAPTURE_FLAG:
+        while move:
+            end = (move >> END_SHIFT) & SQUARE_MASK
+            captured_id = enemy_man_id + 2 if move & CAPTURED_KING_FLAG else enemy_man_id
+            masks[captured_id] &= ~(1 << ((move >> CAPTURED_SHIFT) & SQUARE_MASK))
+            move >>= STEP_BITS
+    else:
+        end = (move >> END_SHIFT) & SQUARE_MASK
+    masks[piece_id] = masks[piece_id] & ~(1 << start) | (1 << end)
+    if piece_id == man_id and PROMOTION_MASKS[man_id] >> end & 1:
+        masks[man_id] ^= 1 << end
+        masks[man_id + 2] |= 1 << end
+    return masks
+
+
+class BitboardGameState(GameState):
+    """
+    A GameState which keeps one integer bitmask per piece type (white men, black men, white kings, black kings)
+    and generates moves and captures with shifts and masks instead of scanning the 10x10 board.
+    The string board is still kept up to date, so the UI and CheckersAI can use this class unchanged.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.piece_masks = [0, 0, 0, 0, 0]
+        self.mask_log = []  # piece masks before each move in move_log, used by undo_move
+        self.load_masks_from_board()
+
+    # Rebuild the bitmasks from self.board, call this after self.board is replaced
+    def load_masks_from_board(self):
+        self.piece_masks = [0, 0, 0, 0, 0]
+        for bit in iterate_bits(BOARD_MASK):
+            row, col = BIT_TO_ROW_COL[bit]
+            self.piece_masks[PIECE_IDS[self.board[row][col]]] |= 1 << bit
+        self.piece_masks[0] = 0
+        self.mask_log = []
+        self.zobrist_key = self.compute_zobrist_key()
+
+    def get_snapshot(self):
+        masks = self.piece_masks
+        return masks[1], masks[2], masks[3], masks[4], self.white_to_move
+
+    def set_board(self, board, white_to_move=True):
+        super().set_board(board, white_to_move)
+        self.load_masks_from_board()
+
+    def get_move_history(self):
+        if not self.compact_move_log:
+            return super().get_move_history()
+        return [record >> 1 for record in self.compact_move_log]
+
+    def get_own_and_enemy_masks(self):
+        masks = self.piece_masks
+        if self.white_to_move:
+            return masks[1], masks[3], masks[2] | masks[4]
+        return masks[2], masks[4], masks[1] | masks[3]
+
+    def get_capture_masks(self):
+        men, kings, enemy = self.get_own_and_enemy_masks()
+        enemy_kings = self.piece_masks[4] if self.white_to_move else self.piece_masks[3]
+        return men, kings, enemy, enemy_kings, self.get_empty_mask()
+
+    def get_empty_mask(self):
+        masks = self.piece_masks
+        return BOARD_MASK & ~(masks[1] | masks[2] | masks[3] | masks[4])
+
+    def make_move(self, move, seaching_mode=False):
+        masks = self.piece_masks
+        self.mask_log.append(masks.copy())
+        start_bit = ROW_COL_TO_BIT[move.start_row * 10 + move.start_col]
+        end_bit = ROW_COL_TO_BIT[move.end_row * 10 + move.end_col]
+        masks[PIECE_IDS[move.piece_moved]] ^= (1 << start_bit) | (1 << end_bit)
+        if move.captured_piece != "--":
+            row, col = move.captured_piece_pos
+            masks[PIECE_IDS[move.captured_piece]] &= ~(1 << ROW_COL_TO_BIT[row * 10 + col])
+        super().make_move(move, seaching_mode)
+
+    def undo_move(self, only_one=False):
+        move_count = len(self.move_log)
+        super().undo_move(only_one)
+        undone_count = move_count - len(self.move_log)
+        if undone_count:
+            self.piece_masks = self.mask_log[-undone_count]
+            del self.mask_log[-undone_count:]
+
+    def change_turn(self):
+        super().change_turn()
+        # man promotion to king, the same rule as in GameState.change_turn
+        if len(self.move_log):
+            last_move = self.move_log[-1]
+            if last_move.is_man_promotion:
+                bit = 1 << ROW_COL_TO_BIT[last_move.end_row * 10 + last_move.end_col]
+                man_id = PIECE_IDS[last_move.piece_moved]
+                if self.piece_masks[man_id] & bit:
+                    self.piece_masks[man_id] ^= bit
+                    self.piece_masks[man_id + 2] |= bit
+
+    # The Move based interface of GameState, built from the compact moves of generate_moves
+    def get_all_possible_moves(self):
+        moves = [self.get_move_from_compact(move) for move in self.get_compact_moves()]
+        if len(moves) and type(moves[0]) is list:
+            self.is_capturing = True
+        return moves
+
+    def get_all_possible_captures(self):
+        moves = [self.get_move_from_compact(move) for move in self.get_compact_moves(True)]
+        if len(moves):
+            self.is_capturing = True
+        return moves
+
+    def generate_moves(self, buffer, captures_only=False):
+        return generate_bitboard_moves(self.piece_masks, self.white_to_move, buffer, captures_only)
+
+    def make_compact_move(self, move):
+        masks = self.piece_masks
+        board = self.board
+        man_id = 1 if self.white_to_move else 2
+        enemy_man_id = 3 - man_id
+        start = move & SQUARE_MASK
+        piece_id = man_id if (masks[man_id] >> start) & 1 else man_id + 2
+        key = self.zobrist_key
+
+        if move & CAPTURE_FLAG:
+            step = move
+            while step:
+                end = (step >> END_SHIFT) & SQUARE_MASK
+                captured = (step >> CAPTURED_SHIFT) & SQUARE_MASK
+                captured_id = enemy_man_id + 2 if step & CAPTURED_KING_FLAG else enemy_man_id
+                masks[captured_id] ^= 1 << captured
+                row, col = BIT_TO_ROW_COL[captured]
+                board[row][col] = "--"
+                key ^= ZOBRIST_BIT_KEYS[captured_id][captured]
+                self.piece_counts[PIECE_NAMES[captured_id]] -= 1
+                self.material_score -= PIECE_MATERIAL[captured_id]
+                step >>= STEP_BITS
+        else:
+            end = (move >> END_SHIFT) & SQUARE_MASK
+
+        # a king can end a capture sequence on its start square
+        masks[piece_id] = masks[piece_id] & ~(1 << start) | (1 << end)
+        key ^= ZOBRIST_BIT_KEYS[piece_id][start] ^ ZOBRIST_BIT_KEYS[piece_id][end]
+        row, col = BIT_TO_ROW_COL[start]
+        board[row][col] = "--"
+        row, col = BIT_TO_ROW_COL[end]
+        promoted = 0
+        if piece_id == man_id and PROMOTION_MASKS[man_id] >> end & 1:
+            promoted = 1
+            masks[man_id] ^= 1 << end
+            masks[man_id + 2] |= 1 << end
+            key ^= ZOBRIST_BIT_KEYS[man_id][end] ^ ZOBRIST_BIT_KEYS[man_id + 2][end]
+            self.piece_counts[PIECE_NAMES[man_id]] -= 1
+            self.piece_counts[PIECE_NAMES[man_id + 2]] += 1
+            self.material_score += PIECE_MATERIAL[man_id + 2] - PIECE_MATERIAL[man_id]
+            piece_id = man_id + 2
+        board[row][col] = PIECE_NAMES[piece_id]
+
+        self.white_to_move = not self.white_to_move
+        self.zobrist_key = key ^ ZOBRIST_BLACK_TO_MOVE
+        self.compact_move_log.append(move << 1 | promoted)
+
+    def undo_compact_move(self):
+        record = self.compact_move_log.pop()
+        move = record >> 1
+        masks = self.piece_masks
+        board = self.board
+        self.white_to_move = not self.white_to_move
+        man_id = 1 if self.white_to_move else 2
+        enemy_man_id = 3 - man_id
+        start = move & SQUARE_MASK
+        key = self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE
+
+        if move & CAPTURE_FLAG:
+            step = move
+            while step:
+                end = (step >> END_SHIFT) & SQUARE_MASK
+                captured = (step >> CAPTURED_SHIFT) & SQUARE_MASK
+                captured_id = enemy_man_id + 2 if step & CAPTURED_KING_FLAG else enemy_man_id
+                masks[captured_id] |= 1 << captured
+                row, col = BIT_TO_ROW_COL[captured]
+                board[row][col] = PIECE_NAMES[captured_id]
+                key ^= ZOBRIST_BIT_KEYS[captured_id][captured]
+                self.piece_counts[PIECE_NAMES[captured_id]] += 1
+                self.material_score += PIECE_MATERIAL[captured_id]
+                step >>= STEP_BITS
+        else:
+            end = (move >> END_SHIFT) & SQUARE_MASK
+
+        if record & 1:  # the man was promoted on the end square
+            masks[man_id + 2] ^= 1 << end
+            masks[man_id] |= 1 << end
+            key ^= ZOBRIST_BIT_KEYS[man_id][end] ^ ZOBRIST_BIT_KEYS[man_id + 2][end]
+            self.piece_counts[PIECE_NAMES[man_id]] += 1
+            self.piece_counts[PIECE_NAMES[man_id + 2]] -= 1
+            self.material_score += PIECE_MATERIAL[man_id] - PIECE_MATERIAL[man_id + 2]
+        piece_id = man_id if (masks[man_id] >> end) & 1 else man_id + 2
+        masks[piece_id] = masks[piece_id] & ~(1 << end) | (1 << start)
+        key ^= ZOBRIST_BIT_KEYS[piece_id][start] ^ ZOBRIST_BIT_KEYS[piece_id][end]
+        row, col = BIT_TO_ROW_COL[end]
+        board[row][col] = "--"
+        row, col = BIT_TO_ROW_COL[start]
+        board[row][col] = PIECE_NAMES[piece_id]
+        self.zobrist_key = key
+
+    def is_game_over(self):
+        men, kings, enemy = self.get_own_and_enemy_masks()
+        empty = self.get_empty_mask()
+        if has_capture(men, kings, enemy, empty):
+            self.is_capturing = True
+            return False
+        man_shifts = WHITE_MAN_SHIFTS if self.white_to_move else BLACK_MAN_SHIFTS
+        for shift in man_shifts:
+            if shift_mask(men, shift) & empty:
+                return False
+        for shift in BITBOARD_SHIFTS:
+            if shift_mask(kings, shift) & empty:
+                return False
+        return True
+
+    def can_capture(self):
+        men, kings, enemy = self.get_own_and_enemy_masks()
+        if has_capture(men, kings, enemy, self.get_empty_mask()):
+            self.is_capturing = True
+            return True
+        return False
@@ -0,0 +1,231 @@
+"""
+Static evaluation. The score of a position is a weighted sum of terms, in units of a man, positive for white:
+
+    man, king    material: the number of white pieces minus the number of black pieces
+    tempo        rows the men have advanced, white minus black
+    back_rank    men still on their own back row, guarding the promotion squares of the opponent
+    center       men on the six center squares (22-24, 27-29)
+    runaway      men near promotion with no piece on the squares in front of them
+    man_pst      one weight per square for men, the squares of white (black uses the mirrored square)
+    king_pst     the same for kings
+
+Every term except runaway depends only on which piece stands on which square, so these terms are added together
+into one weight per piece and square when the weights are set, and then into one table per piece and byte of its
+bitmask. A position is scored with 4 x 7 table lookups plus a check of the few men near promotion.
+
+The weights are read from a JSON file (a dict with the names above, man_pst and king_pst are lists of 50 numbers),
+so tuned weights (see CheckersTuner) can be used without code changes. Missing names keep their default.
+"""
+import json
+import os
+
+import CheckersEngine
+
+SQUARE_COUNT = CheckersEngine.SQUARE_COUNT
+BYTE_COUNT = (CheckersEngine.BIT_COUNT + 7) // 8
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_weights.json")
+
+SCALAR_TERMS = ("man", "king", "tempo", "back_rank", "center", "runaway")
+TABLE_TERMS = ("man_pst", "king_pst")
+DEFAULT_WEIGHTS = {"man": 1.0, "king": 3.0, "tempo": 0.02, "back_rank": 0.1, "center": 0.1, "runaway": 0.5,
+                   "man_pst": [0.0] * SQUARE_COUNT, "king_pst": [0.0] * SQUARE_COUNT}
+
+CENTER_SQUARES = (22, 23, 24, 27, 28, 29)
+RUNAWAY_ROWS = 3  # men at most this many rows from promotion are checked for a free path
+
+WHITE_MAN, BLACK_MAN, WHITE_KING, BLACK_KING = (CheckersEngine.PIECE_IDS[piece] for piece in ("wm", "bm", "wk", "bk"))
+
+
+# The square seen from the other side of the board
+def mirror_square(square):
+    return SQUARE_COUNT + 1 - square
+
+
+# Rows a man of white (white=True) or black on the square has advanced from its own back row
+def get_advance(square, white):
+    row = (square - 1) // 5
+    return 9 - row if white else row
+
+
+# The squares in front of a man on the square up to the promotion row, widening by one column per row, or 0 if
+# the man is more than RUNAWAY_ROWS rows from promotion
+def get_runaway_mask(square, white):
+    row, col = CheckersEngine.Move.square_position_to_row_col[square]
+    rows_left = row if white else 9 - row
+    if not 0 < rows_left <= RUNAWAY_ROWS:
+        return 0
+    mask = 0
+    for distance in range(1, rows_left + 1):
+        front_row = row - distance if white else row + distance
+        for front_col in range(col - distance, col + distance + 1):
+            bit = CheckersEngine.ROW_COL_TO_BIT[front_row * 10 + front_col] if 0 <= front_col < 10 else -1
+            if bit >= 0:
+                mask |= 1 << bit
+    return mask
+
+
+RUNAWAY_MASKS = [[0] * CheckersEngine.BIT_COUNT for _ in CheckersEngine.PIECE_NAMES]  # by piece id and bit
+RUNAWAY_CANDIDATES = [0] * len(CheckersEngine.PIECE_NAMES)  # bits of the men that are checked, by piece id
+for _square in range(1, SQUARE_COUNT + 1):
+    _bit = CheckersEngine.get_bit_of_square(_square)
+    for _piece_id, _white in ((WHITE_MAN, True), (BLACK_MAN, False)):
+        RUNAWAY_MASKS[_piece_id][_bit] = get_runaway_mask(_square, _white)
+        if RUNAWAY_MASKS[_piece_id][_bit]:
+            RUNAWAY_CANDIDATES[_piece_id] |= 1 << _bit
+
+
+class Evaluation:
+    """
+    An evaluation with one set of weights. Changing the weights (set_weights, load) rebuilds the lookup tables.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = {}
+        self.square_weights = []  # weight of each piece id on each square (index square - 1), black negative
+        self.byte_tables = []  # [piece id - 1][byte index][byte value] -> sum of the weights of the bits
+        self.set_weights(DEFAULT_WEIGHTS if weights is None else weights)
+
+    def set_weights(self, weights):
+        merged = {name: list(value) if name in TABLE_TERMS else value for name, value in DEFAULT_WEIGHTS.items()}
+        for name, value in weights.items():
+            if name not in merged:
+                raise ValueError(f"unknown evaluation weight: {name}")
+            if name in TABLE_TERMS:
+                if len(value) != SQUARE_COUNT:
+                    raise ValueError(f"{name} needs {SQUARE_COUNT} weights")
+                merged[name] = [float(weight) for weight in value]
+            else:
+                merged[name] = float(value)
+        self.weights = merged
+        self.build_tables()
+
+    # Fold all square terms into one weight per piece and square, then into the byte tables
+    def build_tables(self):
+        weights = self.weights
+        self.square_weights = [[0.0] * SQUARE_COUNT for _ in CheckersEngine.PIECE_NAMES]
+        for square in range(1, SQUARE_COUNT + 1):
+            for white in (True, False):
+                sign = 1 if white else -1
+                own_square = square if white else mirror_square(square)
+                man_weight = weights["man"] + weights["tempo"] * get_advance(square, white) + \
+                    weights["man_pst"][own_square - 1]
+                if get_advance(square, white) == 0:
+                    man_weight += weights["back_rank"]
+                if square in CENTER_SQUARES:
+                    man_weight += weights["center"]
+                king_weight = weights["king"] + weights["king_pst"][own_square - 1]
+                man_id, king_id = (WHITE_MAN, WHITE_KING) if white else (BLACK_MAN, BLACK_KING)
+                self.square_weights[man_id][square - 1] = sign * man_weight
+                self.square_weights[king_id][square - 1] = sign * king_weight
+
+        self.byte_tables = []
+        for piece_id in range(1, len(CheckersEngine.PIECE_NAMES)):
+            bit_weights = [0.0] * (BYTE_COUNT * 8)
+            for square in range(1, SQUARE_COUNT + 1):
+                bit_weights[CheckersEngine.get_bit_of_square(square)] = self.square_weights[piece_id][square - 1]
+            tables = []
+            for byte_index in range(BYTE_COUNT):
+                table = [0.0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    table[value] = table[value ^ low] + bit_weights[byte_index * 8 + low.bit_length() - 1]
+                tables.append(table)
+            self.byte_tables.append(tables)
+
+    # Score of the position given by the piece masks, positive is good for white
+    def evaluate_masks(self, white_men, black_men, white_kings, black_kings):
+        score = 0.0
+        for tables, mask in zip(self.byte_tables, (white_men, black_men, white_kings, black_kings)):
+            byte_index = 0
+            while mask:
+                score += tables[byte_index][mask & 255]
+                mask >>= 8
+                byte_index += 1
+
+        runaway_weight = self.weights["runaway"]
+        if runaway_weight:
+            occupied = white_men | black_men | white_kings | black_kings
+            for piece_id, men, sign in ((WHITE_MAN, white_men, 1), (BLACK_MAN, black_men, -1)):
+                candidates = men & RUNAWAY_CANDIDATES[piece_id]
+                runaway_masks = RUNAWAY_MASKS[piece_id]
+                while candidates:
+                    low = candidates & -candidates
+                    if not runaway_masks[low.bit_length() - 1] & occupied:
+                        score += sign * runaway_weight
+                    candidates ^= low
+        return score
+
+    def evaluate(self, gs):
+        white_men, black_men, white_kings, black_kings, _ = gs.get_snapshot()
+        return self.evaluate_masks(white_men, black_men, white_kings, black_kings)
+
+    # The names of the parameters in the order of get_parameters and get_features
+    @staticmethod
+    def get_parameter_names():
+        return list(SCALAR_TERMS) + [f"{name}[{square}]" for name in TABLE_TERMS for square in
+                                     range(1, SQUARE_COUNT + 1)]
+
+    # All weights as one flat list
+    def get_parameters(self):
+        return [self.weights[name] for name in SCALAR_TERMS] + \
+            [weight for name in TABLE_TERMS for weight in self.weights[name]]
+
+    def set_parameters(self, parameters):
+        weights = {name: parameters[index] for index, name in enumerate(SCALAR_TERMS)}
+        for table_index, name in enumerate(TABLE_TERMS):
+            start = len(SCALAR_TERMS) + table_index * SQUARE_COUNT
+            weights[name] = parameters[start:start + SQUARE_COUNT]
+        self.set_weights(weights)
+
+    # The value of each term of a position, white minus black, in the order of get_parameters. The score is the sum
+    # of the products of the features and the parameters, so the evaluation is linear in its weights (see
+    # CheckersTuner).
+    @staticmethod
+    def get_features(white_men, black_men, white_kings, black_kings):
+        features = [0.0] * (len(SCALAR_TERMS) + len(TABLE_TERMS) * SQUARE_COUNT)
+        man_pst_start = len(SCALAR_TERMS)
+        king_pst_start = man_pst_start + SQUARE_COUNT
+        occupied = white_men | black_men | white_kings | black_kings
+        for piece_id, mask, white in ((WHITE_MAN, white_men, True), (BLACK_MAN, black_men, False),
+                                      (WHITE_KING, white_kings, True), (BLACK_KING, black_kings, False)):
+            sign = 1 if white else -1
+            is_man = piece_id in (WHITE_MAN, BLACK_MAN)
+            for bit in CheckersEngine.iterate_bits(mask):
+                square = CheckersEngine.get_square_of_bit(bit)
+                own_square = square if white else mirror_square(square)
+                if not is_man:
+                    features[1] += sign
+                    features[king_pst_start + own_square - 1] += sign
+                    continue
+                features[0] += sign
+                features[2] += sign * get_advance(square, white)
+                features[3] += sign * (get_advance(square, white) == 0)
+                features[4] += sign * (square in CENTER_SQUARES)
+                runaway_mask = RUNAWAY_MASKS[piece_id][bit]
+                features[5] += sign * (runaway_mask != 0 and not runaway_mask & occupied)
+                features[man_pst_start + own_square - 1] += sign
+        return features
+
+    def load(self, path=DEFAULT_WEIGHTS_PATH):
+        with open(path) as file:
+            self.set_weights(json.load(file))
+
+    def save(self, path=DEFAULT_WEIGHTS_PATH):
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self.weights, file, indent=1)
+        os.replace(temporary_path, path)
+
+
+# The evaluation with the weights of DEFAULT_WEIGHTS_PATH, or with the default weights if there is no such file,
+# created once per process
+default_evaluation = None
+
+
+def get_default_evaluation():
+    global default_evaluation
+    if default_evaluation is None:
+        default_evaluation = Evaluation()
+        if os.path.exists(DEFAULT_WEIGHTS_PATH):
+            default_evaluation.load(DEFAULT_WEIGHTS_PATH)
+    return default_evaluation
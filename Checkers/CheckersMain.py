@@ -5,7 +5,7 @@ user input and displaying the current GameState object.
 import math
 
 import pygame
-from Checkers import CheckersEngine, CheckersAI
+from Checkers import CheckersEngine, CheckersAI, CheckersPdn, CheckersPonder
 
 
 BOARD_WIDTH = BOARD_HEIGHT = 640
@@ -15,6 +15,9 @@ DIMENSION = 10  # dimensions of a checkers board are 10x10
 SQ_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+GAME_STATE = CheckersEngine.BitboardGameState  # CheckersEngine.GameState for the plain 10x10 string board
+SAVED_GAMES_PATH = "games.pdn"  # games are appended to this file when 's' is pressed
+AI_DEPTH = 5
 
 
 # Initialize a global dictionary of images. This will be called exactly once in main
@@ -41,7 +44,7 @@ def main():
     clock = pygame.time.Clock()
     screen.fill((255, 255, 255))
     move_log_font = pygame.font.SysFont("Arial", 12, False, False)
-    gs = CheckersEngine.GameState()
+    gs = GAME_STATE()
     valid_moves = gs.get_valid_moves()
     move_made = False  # flag variable for when a move is made
     load_images()  # only do this once, before the while loop
@@ -53,6 +56,15 @@ def main():
     player_two = True  # Same as above but for black
     game_over = False
     paused = True  # can be used to pause the game while playing AI. User can press enter to pause the game
+    # the AI searches on the human's time when a human plays against it, see CheckersPonder
+    ponderer = CheckersPonder.Ponderer(AI_DEPTH)
+    ai_future = None  # future of the running AI search, the AI searches in the background so the window stays live
+    ai_progress = None  # SearchResult of the deepest completed depth of the running AI search
+
+    def show_ai_progress(result):  # called in the search thread
+        nonlocal ai_progress
+        ai_progress = result
+
     while running:
         is_human_turn = (gs.white_to_move and player_one) or (not gs.white_to_move and player_two)
         for e in pygame.event.get():
@@ -89,13 +101,25 @@ def main():
             # key handle
             elif e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_z:  # undo when 'z' is pressed
+                    ponderer.stop()  # cancels the AI search
+                    ai_future = None
                     gs.undo_move()
                     valid_moves = gs.get_valid_moves()
                     game_over = False
                 if e.key == pygame.K_SPACE:
                     paused = not paused
+                if e.key == pygame.K_s:  # save the game when 's' is pressed
+                    try:
+                        pdn_game = CheckersPdn.PdnGame.from_game_state(gs)
+                    except ValueError:
+                        pdn_game = None  # a capture sequence is not finished yet
+                    if pdn_game is not None:
+                        with open(SAVED_GAMES_PATH, "a", encoding="utf-8") as file:
+                            CheckersPdn.write_games(file, [pdn_game])
                 if e.key == pygame.K_r:  # reset the board when 'r' is pressed
-                    gs = CheckersEngine.GameState()
+                    ponderer.stop()
+                    ai_future = None
+                    gs = GAME_STATE()
                     player_clicks = []
                     sq_selected = ()
                     valid_moves = gs.get_valid_moves()
@@ -104,11 +128,18 @@ def main():
                     move_made = False
 
         # AI Move Finder Logic
-        if not is_human_turn and not game_over and not paused:
-            ai_move = CheckersAI.find_best_move_min_max(gs, 5)
+        if not is_human_turn and not game_over and not paused and ai_future is None:
+            ai_progress = None
+            ai_future = ponderer.search_async(gs, show_ai_progress)
+
+        if not is_human_turn and not game_over and not paused and ai_future is not None and ai_future.done():
+            ai_move = ai_future.result().best_move
+            ai_future = None
 
             if ai_move is None:
                 ai_move = CheckersAI.find_random_move(valid_moves)
+            else:
+                ai_move = gs.get_move_from_compact(ai_move)  # the search works with compact moves
 
             # gs.make_move_extended(ai_move)
             if type(ai_move) is list:
@@ -145,11 +176,19 @@ def main():
                 else:
                     draw_end_game_text(screen, "White Wins")
 
+        # ponder while the human is to move against the AI, but not in the middle of a capture sequence
+        human_to_move = (gs.white_to_move and player_one) or (not gs.white_to_move and player_two)
+        if human_to_move and player_one != player_two and not game_over and gs.capture_index < 2:
+            ponderer.start(gs)
+
         if not game_over:
             draw_game_state(screen, gs, possible_moves_for_selected, sq_selected, move_log_font)
+            if ai_future is not None:
+                draw_ai_progress(screen, ai_progress, move_log_font)
 
         clock.tick(MAX_FPS)
         pygame.display.flip()
+    ponderer.close()
 
 
 # Responsible for all the graphics within a current game state.
@@ -247,6 +286,20 @@ def draw_move_log(screen, gs, font):
 
 
 
+# Draw the depth, the best move and the score of the running AI search at the bottom of the move log panel
+def draw_ai_progress(screen, result, font):
+    if result is None or result.best_move is None:
+        text = "AI thinking..."
+    else:
+        score = "" if result.score is None else f" ({result.score:+.2f})"
+        text = f"AI depth {result.depth}: {CheckersPdn.format_move(result.best_move, [])}{score}"
+    text_obj = font.render(text, True, pygame.Color("yellow"))
+    text_rect = pygame.Rect(BOARD_WIDTH, BOARD_HEIGHT - text_obj.get_height() - 10, MOVE_LOG_PANEL_WIDTH,
+                            text_obj.get_height() + 10)
+    pygame.draw.rect(screen, pygame.Color("black"), text_rect)
+    screen.blit(text_obj, (BOARD_WIDTH + 5, text_rect.y + 5))
+
+
 # animating a move
 def animate_move(move, screen, board, clock):
     global colors
@@ -0,0 +1,112 @@
+"""
+Move ordering for the alpha-beta searches in CheckersAI. The earlier a move that causes a cutoff is searched,
+the fewer nodes alpha-beta has to visit, so the moves of every node are sorted before they are searched:
+1. the transposition table / principal variation move
+2. the killer moves of the ply (quiet moves that caused a cutoff in a sibling node)
+3. captures, by the value of the captured pieces (captures are compulsory, so either all or none of the moves
+   of a node are captures)
+4. the remaining moves by their history heuristic score
+"""
+
+import CheckersEngine
+
+TT_MOVE_SCORE = 1 << 40
+KILLER_MOVE_SCORES = (1 << 38, 1 << 37)
+CAPTURE_SCORE = 1 << 30
+KILLER_SLOTS = 2
+
+
+# Material value of the pieces captured by a compact move (a man is worth 1, a king 3)
+def get_captured_value(move):
+    value = 0
+    while move:
+        value += 3 if move & CheckersEngine.CAPTURED_KING_FLAG else 1
+        move >>= CheckersEngine.STEP_BITS
+    return value
+
+
+class MoveOrderer:
+    """
+    Killer and history tables for the compact moves of CheckersEngine (see CheckersEngine.encode_move). A compact
+    move is its own key in both tables.
+    """
+
+    def __init__(self, max_ply=128):
+        self.max_ply = max_ply
+        self.killers = [[None] * KILLER_SLOTS for _ in range(max_ply)]
+        self.history = {}
+        self.score_buffers = []  # one score buffer per ply, filled by order_moves
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    # Call before every new search: the killers are cleared and the history scores are aged
+    def new_search(self):
+        for killers in self.killers:
+            for slot in range(KILLER_SLOTS):
+                killers[slot] = None
+        for key in self.history:
+            self.history[key] >>= 1
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def clear(self):
+        self.new_search()
+        self.history.clear()
+
+    # Sort moves[0:count] in place, with the most promising move first. tt_move is the compact move from the
+    # transposition table or the principal variation. The scores are written to the score buffer of the ply, which
+    # is reused like the move buffers of the Searcher, and the moves are sorted by an insertion sort over both
+    # buffers: nodes have few moves, and no key function or list is created per node.
+    def order_moves(self, moves, count, ply, tt_move=None):
+        if count < 2:
+            return
+        killers = self.killers[ply] if ply < self.max_ply else (None,) * KILLER_SLOTS
+        first_killer, second_killer = killers[0], killers[1]
+        history = self.history
+        while ply >= len(self.score_buffers):
+            self.score_buffers.append([])
+        scores = self.score_buffers[ply]
+        if len(scores) < count:
+            scores.extend([0] * (count - len(scores)))
+
+        for index in range(count):
+            move = moves[index]
+            if move == tt_move:
+                score = TT_MOVE_SCORE
+            elif move == first_killer:
+                score = KILLER_MOVE_SCORES[0]
+            elif move == second_killer:
+                score = KILLER_MOVE_SCORES[1]
+            elif move & CheckersEngine.CAPTURE_FLAG:
+                score = CAPTURE_SCORE * get_captured_value(move) + history.get(move, 0)
+            else:
+                score = history.get(move, 0)
+            # a move only passes moves with a lower score, so moves without any information keep the order of the
+            # move generator
+            position = index
+            while position > 0 and scores[position - 1] < score:
+                scores[position] = scores[position - 1]
+                moves[position] = moves[position - 1]
+                position -= 1
+            scores[position] = score
+            moves[position] = move
+
+    # Call when the move at position move_index of the ordered moves caused a beta cutoff
+    def record_cutoff(self, move, depth, ply, move_index):
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+        self.history[move] = self.history.get(move, 0) + depth * depth
+        if not move & CheckersEngine.CAPTURE_FLAG and ply < self.max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+    def get_first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def get_stats(self):
+        return {"cutoffs": self.cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.get_first_move_cutoff_rate(), "history_size": len(self.history)}
@@ -0,0 +1,149 @@
+"""
+Root-parallel search. The moves of the root position are searched by a pool of worker processes, each with its own
+Searcher (and so its own transposition table and move ordering). Workers get the position as a packed snapshot
+(see CheckersEngine.pack_snapshot) and share the best root score found so far, so later root moves are searched with a
+narrower window. By default the workers play the same engine as CheckersAI.new_default_searcher: the default
+evaluation weights, opening book and tablebase, and the book and the tablebase are also consulted at the root.
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import CheckersAI
+import CheckersBook
+import CheckersEngine
+import CheckersEvaluation
+import CheckersTablebase
+
+# state of a worker process, set by init_worker
+worker_searcher = None
+worker_best_score = None
+
+
+# The opening book and the tablebase are sent as their paths (see their __getstate__) and mapped again by the
+# worker, the evaluation as its weights
+def init_worker(best_score, tt_memory_mb, weights, opening_book, tablebase):
+    global worker_searcher, worker_best_score
+    worker_searcher = CheckersAI.Searcher(tt_memory_mb=tt_memory_mb, opening_book=opening_book, tablebase=tablebase,
+                                          evaluation=CheckersEvaluation.Evaluation(weights))
+    worker_best_score = best_score
+
+
+# Search the root move at move_index of the position in snapshot to depth - 1.
+# best_score holds the best root score found by any worker, from the point of view of the side to move at the root.
+# Return the move index, the score (positive is good for white), the bound the move was searched against and the
+# node count. A score that does not improve on its bound is only an upper bound for the side to move.
+def search_root_move(snapshot, move_index, depth):
+    gs = CheckersEngine.BitboardGameState.from_packed_snapshot(snapshot)
+    turn_multiplier = 1 if gs.white_to_move else -1
+    move = gs.get_compact_moves()[move_index]
+
+    bound = worker_best_score.value
+    if turn_multiplier == 1:
+        alpha, beta = bound, 255
+    else:
+        alpha, beta = -255, -bound
+
+    searcher = worker_searcher
+    searcher.start_search(gs, depth)
+    searcher.transposition_table.new_search()
+    gs.make_compact_move(move)
+    score = searcher.find_move_min_max_alpha_beta_improved_with_cache(gs, depth - 1, alpha, beta, 1)
+    gs.undo_compact_move()
+
+    with worker_best_score.get_lock():
+        if turn_multiplier * score > worker_best_score.value:
+            worker_best_score.value = turn_multiplier * score
+    return move_index, score, bound, searcher.counter + searcher.quiescence_nodes
+
+
+class ParallelSearcher:
+    """
+    Searches the root moves of a position in parallel. The process pool is started once and reused by every
+    search, call close() (or use the object as a context manager) to stop it. The evaluation, opening book and
+    tablebase default to those of CheckersAI.new_default_searcher.
+    """
+
+    def __init__(self, workers=None, depth=6, tt_memory_mb=16, evaluation=None, opening_book=None, tablebase=None):
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.depth = depth
+        evaluation = evaluation if evaluation is not None else CheckersEvaluation.get_default_evaluation()
+        opening_book = opening_book if opening_book is not None else CheckersBook.get_default_book()
+        tablebase = tablebase if tablebase is not None else CheckersTablebase.get_default_tablebase()
+        # answers the root position from the book or the tablebase, like the serial searches
+        self.root_searcher = CheckersAI.Searcher(depth, tt_memory_mb=1, eval_cache_mb=0, opening_book=opening_book,
+                                                 tablebase=tablebase)
+        # a double, the evaluation scores are fractions of a man (see CheckersEvaluation)
+        self.best_score = multiprocessing.Value("d", -255.0)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(self.best_score, tt_memory_mb, evaluation.weights, opening_book,
+                                                  tablebase))
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Return a CheckersAI.SearchResult whose best move is one of gs.get_compact_moves()
+    def find_best_move(self, gs, depth=None):
+        known_result = self.root_searcher.find_book_move(gs) or self.root_searcher.find_tablebase_move(gs)
+        if known_result is not None:
+            return known_result
+        depth = self.depth if depth is None else depth
+        start_time = time.time()
+        possible_moves_extended = gs.get_compact_moves()
+        if len(possible_moves_extended) <= 1:
+            best_move = possible_moves_extended[0] if possible_moves_extended else None
+            return CheckersAI.SearchResult(best_move, None, 0, 0, time.time() - start_time)
+
+        turn_multiplier = 1 if gs.white_to_move else -1
+        snapshot = gs.get_packed_snapshot()
+        with self.best_score.get_lock():
+            self.best_score.value = -255.0
+        futures = [self.pool.submit(search_root_move, snapshot, move_index, depth)
+                   for move_index in range(len(possible_moves_extended))]
+
+        best_index = None
+        best_score = None
+        nodes = 0
+        for future in as_completed(futures):
+            move_index, score, bound, move_nodes = future.result()
+            nodes += move_nodes
+            if turn_multiplier * score <= bound:
+                continue  # failed low against the shared bound, another move is at least as good
+            if best_index is None or turn_multiplier * score > turn_multiplier * best_score or \
+                    score == best_score and move_index < best_index:
+                best_index = move_index
+                best_score = score
+
+        return CheckersAI.SearchResult(possible_moves_extended[best_index], best_score, depth, nodes,
+                                       time.time() - start_time)
+
+
+# Search gs with 1 worker and then with each of the worker counts, and return a list of
+# (workers, seconds, speedup over 1 worker, nodes), which can be used to size process pools.
+def measure_speedup(gs, depth=6, worker_counts=(1, 2, 4, 8, 16, 32)):
+    curve = []
+    base_time = None
+    for workers in sorted(set((1,) + tuple(worker_counts))):
+        with ParallelSearcher(workers, depth) as searcher:
+            searcher.find_best_move(gs, 1)  # start the worker processes before measuring
+            result = searcher.find_best_move(gs)
+        if base_time is None:
+            base_time = result.elapsed_time
+        curve.append((workers, result.elapsed_time, base_time / result.elapsed_time, result.nodes))
+    return curve
+
+
+def main():
+    gs = CheckersEngine.BitboardGameState()
+    for workers, seconds, speedup, nodes in measure_speedup(gs, 6, (1, 2, 4, multiprocessing.cpu_count())):
+        print(f"workers: {workers}, time: {seconds:.3f}, speedup: {speedup:.2f}, nodes: {nodes}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+PDN game records (Portable Draughts Notation). Games are written with the seven standard tags, GameType 20
+(international draughts) and a FEN tag when the game does not start from the initial position. Moves use the square
+numbers 1-50: "32-28" for a move, "28x19" for a capture, with the landing squares in between ("28x17x8") only when
+the start and end square alone are ambiguous.
+
+The reader is a generator that reads one line at a time and yields one game at a time, so archives of any size can
+be read without loading them. Comments, variations, NAGs and move numbers are skipped. The games are checked by
+replaying them through a GameState (see PdnGame.replay and replay_games).
+
+Usage: python CheckersPdn.py games.pdn
+"""
+import argparse
+import re
+import time
+
+import CheckersEngine
+
+INITIAL_FEN = "W:W31-50:B1-20"
+RESULTS = ("2-0", "1-1", "0-2", "1-0", "0-1", "0-0", "*")
+ROSTER_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+LINE_LENGTH = 80
+
+TAG_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# comments, variations, NAGs, move numbers, results, moves and anything else
+TOKEN_PATTERN = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|\d+\.+|(?:2-0|1-1|0-2|1-0|0-1|0-0|\*)(?=\s|$)"
+                           r"|(\d+(?:[-x]\d+)+)[!?]*|\S+")
+VARIATION_PATTERN = re.compile(r"\([^()]*\)")
+MOVE_PATTERN = re.compile(r"\d+(?:([-x])\d+)+")
+
+
+# The squares of a compact move: the start square and the landing square of every step
+def get_move_squares(move):
+    squares = [CheckersEngine.get_square_of_bit(move & CheckersEngine.SQUARE_MASK)]
+    if not move & CheckersEngine.CAPTURE_FLAG:
+        squares.append(CheckersEngine.get_square_of_bit(move >> CheckersEngine.END_SHIFT & CheckersEngine.SQUARE_MASK))
+        return squares
+    while move:
+        squares.append(CheckersEngine.get_square_of_bit(move >> CheckersEngine.END_SHIFT & CheckersEngine.SQUARE_MASK))
+        move >>= CheckersEngine.STEP_BITS
+    return squares
+
+
+# The PDN text of move, one of the compact moves legal_moves of the position
+def format_move(move, legal_moves):
+    squares = get_move_squares(move)
+    if not move & CheckersEngine.CAPTURE_FLAG:
+        return f"{squares[0]}-{squares[-1]}"
+    for other_move in legal_moves:
+        other_squares = get_move_squares(other_move)
+        if other_move != move and other_squares[0] == squares[0] and other_squares[-1] == squares[-1]:
+            return "x".join(str(square) for square in squares)
+    return f"{squares[0]}x{squares[-1]}"
+
+
+# The compact move of the PDN text of a move among legal_moves. The squares given in the text have to appear in the
+# same order among the squares of the move, so "28x8" and "28x17x8" both find the capture 28x17x8.
+# Raise ValueError if no move or more than one move matches.
+def parse_move(text, legal_moves):
+    match = MOVE_PATTERN.fullmatch(text.rstrip("!?"))
+    if match is None:
+        raise ValueError(f"invalid move text: {text}")
+    is_capture = "x" in text
+    squares = [int(square) for square in re.findall(r"\d+", text)]
+    found_moves = []
+    for move in legal_moves:
+        if bool(move & CheckersEngine.CAPTURE_FLAG) != is_capture:
+            continue
+        move_squares = get_move_squares(move)
+        if move_squares[0] != squares[0] or move_squares[-1] != squares[-1]:
+            continue
+        remaining = iter(move_squares[1:-1])
+        if all(square in remaining for square in squares[1:-1]):
+            found_moves.append(move)
+    if len(found_moves) != 1:
+        raise ValueError(f"{'illegal' if not found_moves else 'ambiguous'} move: {text}")
+    return found_moves[0]
+
+
+class PdnGame:
+    """
+    One game record: the tags in file order, the moves as PDN text and the result. The moves are only checked when
+    the game is replayed, so reading a large archive costs no move generation.
+    """
+
+    def __init__(self, tags=None, moves=None, result="*"):
+        self.tags = tags if tags is not None else {}
+        self.moves = moves if moves is not None else []
+        self.result = result
+        self.line_number = 0  # line of the game in the file it was read from
+
+    def get_start_fen(self):
+        return self.tags.get("FEN", INITIAL_FEN)
+
+    # Play the moves from the start position on a new game_state_class and return it, the compact moves are then
+    # in gs.get_move_history(). Raise ValueError at the first illegal move.
+    def replay(self, game_state_class=CheckersEngine.BitboardGameState):
+        gs = game_state_class.from_fen(self.get_start_fen())
+        for ply, text in enumerate(self.moves):
+            try:
+                move = parse_move(text, gs.get_compact_moves())
+            except ValueError as error:
+                raise ValueError(f"ply {ply + 1}: {error}") from None
+            gs.make_compact_move(move)
+        return gs
+
+    # The game played in gs, which started from the position start_fen. The result is taken from the position
+    # when it is not given: a loss for the side to move if it has no move, otherwise unfinished ("*").
+    @classmethod
+    def from_game_state(cls, gs, result=None, tags=None, start_fen=INITIAL_FEN):
+        return cls.from_moves(gs.get_move_history(), result, tags, start_fen)
+
+    @classmethod
+    def from_moves(cls, compact_moves, result=None, tags=None, start_fen=INITIAL_FEN):
+        gs = CheckersEngine.BitboardGameState.from_fen(start_fen)
+        moves = []
+        for move in compact_moves:
+            legal_moves = gs.get_compact_moves()
+            if move not in legal_moves:
+                raise ValueError(f"illegal move at ply {len(moves) + 1}")
+            moves.append(format_move(move, legal_moves))
+            gs.make_compact_move(move)
+        if result is None:
+            result = "*" if gs.get_compact_moves() else "0-2" if gs.white_to_move else "2-0"
+
+        game_tags = {tag: "?" for tag in ROSTER_TAGS}
+        game_tags["Date"] = time.strftime("%Y.%m.%d")
+        game_tags["GameType"] = "20"
+        if start_fen != INITIAL_FEN:
+            game_tags["FEN"] = start_fen
+        game_tags.update(tags or {})
+        game_tags["Result"] = result
+        return cls(game_tags, moves, result)
+
+    def to_pdn(self):
+        lines = []
+        for tag, value in self.tags.items():
+            escaped_value = value.replace('"', '\\"')
+            lines.append(f'[{tag} "{escaped_value}"]')
+        lines.append("")
+        white_starts = self.get_start_fen().lstrip()[:1].upper() != "B"
+        tokens = []
+        for ply, move in enumerate(self.moves):
+            white_move = (ply % 2 == 0) == white_starts
+            move_number = (ply + (0 if white_starts else 1)) // 2 + 1
+            if white_move:
+                tokens.append(f"{move_number}.")
+            elif ply == 0:
+                tokens.append(f"{move_number}...")
+            tokens.append(move)
+        tokens.append(self.result)
+
+        line = ""
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > LINE_LENGTH:
+                lines.append(line)
+                line = token
+            else:
+                line = f"{line} {token}" if line else token
+        lines.append(line)
+        return "\n".join(lines) + "\n"
+
+
+def parse_movetext(game, movetext):
+    movetext = movetext.replace("\n", " \n")
+    while True:  # variations can be nested, remove the innermost ones until none is left
+        movetext, count = VARIATION_PATTERN.subn(" ", movetext)
+        if not count:
+            break
+    for match in TOKEN_PATTERN.finditer(movetext):
+        token = match.group()
+        if match.group(1) is not None:
+            game.moves.append(match.group(1))
+        elif token in RESULTS:
+            game.result = token
+        elif token[0] in "{;$" or token[0].isdigit() and token.endswith(".") or not token.strip("!?"):
+            continue  # comment, NAG, move number or annotation
+        else:
+            game.moves.append(token)  # not a move, replay reports it as an invalid move
+
+
+# Yield the games of a PDN text file (any iterable of lines) one at a time
+def read_games(file):
+    game = None
+    movetext = []
+    in_comment = False
+    for line_number, line in enumerate(file, 1):
+        stripped = line.strip()
+        if not in_comment and stripped.startswith("["):
+            if game is not None and movetext:
+                parse_movetext(game, "".join(movetext))
+                yield game
+                game = None
+                movetext = []
+            if game is None:
+                game = PdnGame()
+                game.line_number = line_number
+            for tag, value in TAG_PATTERN.findall(stripped):
+                game.tags[tag] = value.replace('\\"', '"')
+            continue
+        if not stripped and not in_comment:
+            continue
+        if game is None:
+            game = PdnGame()
+            game.line_number = line_number
+        movetext.append(line)
+        comment_start = line.rfind("{")
+        comment_end = line.rfind("}")
+        in_comment = comment_start > comment_end or in_comment and comment_end < 0
+        if not in_comment and stripped.split()[-1] in RESULTS:  # the result ends the game
+            parse_movetext(game, "".join(movetext))
+            yield game
+            game = None
+            movetext = []
+    if game is not None:
+        parse_movetext(game, "".join(movetext))
+        yield game
+
+
+# Yield (game, gs) for every game of file that replays without an illegal move, gs is the final position.
+# Invalid games raise ValueError, or are skipped and reported as (line number, error) in errors if a list is given.
+def replay_games(file, game_state_class=CheckersEngine.BitboardGameState, errors=None):
+    for game in read_games(file):
+        try:
+            gs = game.replay(game_state_class)
+        except ValueError as error:
+            if errors is None:
+                raise ValueError(f"game at line {game.line_number}: {error}") from None
+            errors.append((game.line_number, str(error)))
+            continue
+        yield game, gs
+
+
+def write_games(file, games):
+    for game in games:
+        file.write(game.to_pdn())
+        file.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the games of a PDN file and report the invalid ones.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    errors = []
+    games = 0
+    plies = 0
+    with open(args.path, encoding="utf-8", errors="replace") as file:
+        for game, gs in replay_games(file, errors=errors):
+            games += 1
+            plies += len(game.moves)
+    for line_number, error in errors:
+        print(f"line {line_number}: {error}")
+    print(f"{games} valid games, {plies} plies, {len(errors)} invalid games in {time.time() - start_time:.1f} s")
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Perft: count the leaf nodes of the move generation tree to a given depth. A capture sequence counts as one move.
+The counts are compared with stored reference counts, so the move generator (get_all_possible_moves,
+get_all_possible_captures, generate_capture_sequences and the bitboard backend) can be optimized and checked against
+exact numbers.
+Both backends are walked through generate_moves and make_compact_move, the board backend builds its compact moves
+from get_all_possible_moves.
+
+Usage: python CheckersPerft.py --depth 6 --backend bitboard
+"""
+import argparse
+import time
+
+import CheckersEngine
+
+BACKENDS = {"board": CheckersEngine.GameState, "bitboard": CheckersEngine.BitboardGameState}
+
+# Perft positions in draughts FEN (see CheckersEngine.fen_to_snapshot)
+POSITIONS = {
+    "initial": "W:W31-50:B1-20",
+
+    # long man capture chains in several directions
+    "man_chains": "W:W37,39,45,46,47:B12,13,22,23,24,32,33",
+
+    # flying king with several multi-capture routes
+    "king_multi_capture": "W:WK46,50:B9,12,20,21,37,39",
+
+    # kings on both sides in an open endgame
+    "king_endgame": "B:WK33,46,47,48:B29,31,36,37",
+}
+
+# Leaf counts for depth 1, 2, 3, ... of each position. The counts of the initial position are the published
+# international draughts perft numbers. All counts, to the full listed depth, were checked against the original
+# recursive capture generator of GameState (get_man_captures and get_king_captures, before
+# generate_capture_sequences replaced them), which shares no capture code with either backend of today.
+REFERENCE_COUNTS = {
+    "initial": [9, 81, 658, 4265, 27117, 167140, 1049442],
+    "man_chains": [6, 10, 48, 171, 916, 3713, 17966, 104396],
+    "king_multi_capture": [3, 6, 56, 95, 1023, 3332, 34949, 216134],
+    "king_endgame": [1, 5, 5, 16, 62, 102, 504, 966],
+}
+
+
+def create_game_state(position_name, backend="bitboard"):
+    return BACKENDS[backend].from_fen(POSITIONS[position_name])
+
+
+# Moves are generated as compact moves into one reused buffer per depth, see GameState.generate_moves
+def perft(gs, depth, buffers=None):
+    if depth == 0:
+        return 1
+    if buffers is None:
+        buffers = [[] for _ in range(depth)]
+    buffer = buffers[depth - 1]
+    count = gs.generate_moves(buffer)
+    if depth == 1:
+        return count
+    nodes = 0
+    for index in range(count):
+        gs.make_compact_move(buffer[index])
+        nodes += perft(gs, depth - 1, buffers)
+        gs.undo_compact_move()
+    return nodes
+
+
+# Leaf counts below each move of the position, useful to find the move where two move generators differ
+def divide(gs, depth):
+    counts = []
+    for move in gs.get_compact_moves():
+        full_move = gs.get_move_from_compact(move)
+        gs.make_compact_move(move)
+        counts.append((full_move, perft(gs, depth - 1)))
+        gs.undo_compact_move()
+    return counts
+
+
+# Run perft for depth 1 to max_depth on a position and return a list of (depth, nodes, seconds, nodes per second,
+# whether the count equals the reference count or None if there is no reference count for the depth)
+def run_perft(position_name, max_depth, backend="bitboard"):
+    gs = create_game_state(position_name, backend)
+    reference_counts = REFERENCE_COUNTS.get(position_name, [])
+    results = []
+    for depth in range(1, max_depth + 1):
+        start_time = time.perf_counter()
+        nodes = perft(gs, depth)
+        seconds = time.perf_counter() - start_time
+        correct = nodes == reference_counts[depth - 1] if depth <= len(reference_counts) else None
+        results.append((depth, nodes, seconds, nodes / seconds if seconds else 0.0, correct))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes and check them against "
+                                                 "the reference counts.")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--position", choices=sorted(POSITIONS), action="append",
+                        help="position to test, all positions by default")
+    args = parser.parse_args()
+
+    all_correct = True
+    for position_name in args.position or POSITIONS:
+        for depth, nodes, seconds, nodes_per_second, correct in run_perft(position_name, args.depth, args.backend):
+            status = "no reference" if correct is None else "ok" if correct else "WRONG"
+            print(f"{position_name} depth {depth}: {nodes} nodes, {seconds:.3f} s, {nodes_per_second:.0f} nodes/s, "
+                  f"{status}")
+            all_correct = all_correct and correct is not False
+    if not all_correct:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
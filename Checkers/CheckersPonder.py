@@ -0,0 +1,130 @@
+"""
+Pondering: searching on the opponent's time. While the opponent is to move, a background thread searches the
+positions after the replies of the opponent, one depth at a time: first the expected reply (the best move the
+transposition table holds for the position, e.g. from the search of the previous move), then the other replies.
+All these searches fill the transposition table of the Searcher that plays the moves, so when the actual reply
+arrives, the search of the new position finds most of its tree in the table. If the reply was already searched to
+the full depth, its result is played without searching again, and a reply searched to a lower depth is searched
+on from the next depth.
+
+Pondering and searching run in one worker thread, so the Searcher is only used by one thread at a time and a
+front end stays responsive while the AI thinks: search_async returns a future and reports every completed depth
+to a progress callback, and stop cancels the running search or pondering. The worker works on its own copy of the
+position, so the caller may change its game state (undo, reset) right after stop.
+
+Usage:
+    ponderer = Ponderer(6)
+    ponderer.start(gs)  # the opponent is to move in gs
+    result = ponderer.search(gs)  # the opponent has moved, or ponderer.search_async(gs, progress_callback)
+    ponderer.close()
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import CheckersAI
+import CheckersEngine
+
+
+class Ponderer:
+    """
+    Plays the moves of one side with searcher, by default a Searcher of CheckersAI.new_default_searcher(depth), in
+    fixed depth searches with the transposition table (see Searcher.find_best_move_min_max_with_cache), and ponders
+    while the other side is to move. With all_replies=False only the expected reply is pondered on, which reaches
+    a greater depth when the reply is predicted well.
+    """
+
+    def __init__(self, depth=8, searcher=None, all_replies=True):
+        self.searcher = searcher if searcher is not None else CheckersAI.new_default_searcher(depth)
+        self.all_replies = all_replies
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None  # future of the last pondering or search
+        self.position = None  # packed snapshot of the position pondered on
+        self.results = {}  # packed snapshot after a reply -> (depth, SearchResult) of its deepest completed search
+        self.ponder_hits = 0  # searches answered from a pondered result without searching again
+        self.ponder_misses = 0
+
+    def is_pondering(self):
+        return self.position is not None and self.future is not None and not self.future.done()
+
+    # Start pondering on gs, a position with the opponent to move. Nothing changes if the ponderer is already
+    # pondering on (or has pondered on) the same position and has not been stopped since.
+    def start(self, gs):
+        position = gs.get_packed_snapshot()
+        if position == self.position and self.future is not None:
+            return
+        self.stop()
+        self.position = position
+        self.results = {}
+        self.future = self.executor.submit(self.ponder, CheckersEngine.BitboardGameState.from_packed_snapshot(position))
+
+    # Stop the pondering or the search and wait for it. The results of the pondering found so far are kept for
+    # search_async, and the next start pondering again even on the same position. The future of a stopped search
+    # raises CheckersAI.SearchTimeout.
+    def stop(self):
+        if self.future is None:
+            return
+        self.searcher.stop_requested = True
+        wait([self.future])
+        self.future = None
+        self.position = None
+        self.searcher.stop_requested = False
+
+    def close(self):
+        self.stop()
+        self.executor.shutdown()
+
+    # The replies to ponder on, the expected reply first
+    def get_replies(self, gs):
+        replies = gs.get_compact_moves()
+        transposition_table = self.searcher.transposition_table
+        index = transposition_table.probe(gs.zobrist_key)
+        expected_reply = transposition_table.moves[index] if index >= 0 else None
+        if expected_reply in replies:
+            replies.remove(expected_reply)
+            replies.insert(0, expected_reply)
+        return replies if self.all_replies else replies[:1]
+
+    # Body of the pondering thread: search the position after every reply with depth 1, 2, ... up to the depth of
+    # the searcher, until the search is stopped
+    def ponder(self, gs):
+        replies = self.get_replies(gs)
+        try:
+            for depth in range(1, self.searcher.depth + 1):
+                for reply in replies:
+                    gs.make_compact_move(reply)
+                    position = gs.get_packed_snapshot()
+                    result = self.searcher.find_best_move_min_max_with_cache(gs, depth)
+                    gs.undo_compact_move()
+                    self.results[position] = (depth, result)
+        except CheckersAI.SearchTimeout:
+            pass  # gs is left in the middle of the search, it is a copy that is not used again
+
+    # Start the search of the move to play in gs, after the reply of the opponent, and return a future of its
+    # SearchResult. The search continues from the depth the pondering reached for the reply, with the transposition
+    # table filled by the pondering. progress_callback, if given, is called in the worker thread with the
+    # SearchResult of every completed depth.
+    def search_async(self, gs, progress_callback=None):
+        self.stop()
+        position = gs.get_packed_snapshot()
+        depth, result = self.results.get(position, (0, None))
+        self.results = {}
+        if result is not None and depth >= self.searcher.depth:
+            self.ponder_hits += 1
+        else:
+            self.ponder_misses += 1
+        self.future = self.executor.submit(self.run_search, CheckersEngine.BitboardGameState.from_packed_snapshot(
+            position), depth, result, progress_callback)
+        return self.future
+
+    def search(self, gs):
+        return self.search_async(gs).result()
+
+    # Body of a search in the worker thread: deepen the pondered result one depth at a time up to the depth of the
+    # searcher
+    def run_search(self, gs, pondered_depth, result, progress_callback):
+        if result is not None and progress_callback is not None:
+            progress_callback(result)
+        for depth in range(pondered_depth + 1, self.searcher.depth + 1):
+            result = self.searcher.find_best_move_min_max_with_cache(gs, depth)
+            if progress_callback is not None:
+                progress_callback(result)
+        return result
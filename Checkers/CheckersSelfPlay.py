@@ -0,0 +1,236 @@
+"""
+Headless engine-vs-engine matches. Games are played without a display, in parallel worker processes, and the
+match is reported as wins, draws and losses of the first player together with the average nodes and time per move
+of both players.
+
+The games can be saved as PDN (see CheckersPdn), e.g. to build opening books or regression suites from them.
+
+Usage: python CheckersSelfPlay.py --games 200 --player-a min_max_with_cache:6 --player-b iterative_deepening:6:200
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import CheckersAI
+import CheckersEngine
+import CheckersEvaluation
+import CheckersPdn
+
+SEARCH_FUNCTIONS = {
+    "min_max": CheckersAI.Searcher.find_best_move_min_max,
+    "nega_max": CheckersAI.Searcher.find_best_move_nega_max,
+    "principal_variation": CheckersAI.Searcher.find_best_move_principal_variation,
+    "min_max_with_cache": CheckersAI.Searcher.find_best_move_min_max_with_cache,
+    "iterative_deepening": CheckersAI.Searcher.find_best_move_iterative_deepening,
+}
+
+
+class Player:
+    """
+    An engine configuration: the name of a search in SEARCH_FUNCTIONS (or "random"), the search depth (the maximum
+    depth for iterative deepening) and the time budget of iterative deepening in milliseconds. With a weights file
+    (see CheckersEvaluation) the search uses that evaluation instead of material only.
+    """
+
+    def __init__(self, search="min_max", depth=5, time_budget_ms=1000, tt_memory_mb=16, weights_path=None):
+        if search != "random" and search not in SEARCH_FUNCTIONS:
+            raise ValueError(f"unknown search: {search}")
+        self.search = search
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.tt_memory_mb = tt_memory_mb
+        self.weights_path = weights_path
+
+    # Parse "search[:depth[:time_budget_ms]]", e.g. "min_max:5" or "iterative_deepening:64:250"
+    @classmethod
+    def from_string(cls, text):
+        parts = text.split(":")
+        player = cls(parts[0])
+        if len(parts) > 1:
+            player.depth = int(parts[1])
+        if len(parts) > 2:
+            player.time_budget_ms = int(parts[2])
+        return player
+
+    def new_searcher(self):
+        evaluation = None
+        if self.weights_path:
+            evaluation = CheckersEvaluation.Evaluation()
+            evaluation.load(self.weights_path)
+        return CheckersAI.Searcher(self.depth, self.time_budget_ms, tt_memory_mb=self.tt_memory_mb,
+                                   evaluation=evaluation)
+
+    # Return the move to play and the search result (None for the random player)
+    def choose_move(self, gs, searcher, rng):
+        if self.search == "random":
+            return rng.choice(gs.get_compact_moves()), None
+        result = SEARCH_FUNCTIONS[self.search](searcher, gs)
+        return result.best_move, result
+
+    def __str__(self):
+        if self.search == "random":
+            return self.search
+        if self.search == "iterative_deepening":
+            return f"{self.search}:{self.depth}:{self.time_budget_ms}"
+        return f"{self.search}:{self.depth}"
+
+
+# Result of one game, the statistics are indexed by 0 for white and 1 for black
+class GameResult:
+    def __init__(self, winner, plies, nodes, search_time, moves, move_history=None):
+        self.winner = winner  # 1 if white won, -1 if black won, 0 for a draw
+        self.plies = plies
+        self.nodes = nodes
+        self.search_time = search_time
+        self.moves = moves
+        self.move_history = move_history if move_history is not None else []  # the compact moves of the game
+
+    # The game as a CheckersPdn.PdnGame
+    def get_pdn_game(self, white_name, black_name, round_number):
+        result = {1: "2-0", -1: "0-2", 0: "1-1"}[self.winner]
+        tags = {"Event": "self-play", "Round": str(round_number), "White": white_name, "Black": black_name}
+        return CheckersPdn.PdnGame.from_moves(self.move_history, result, tags)
+
+
+# Play one game between white and black. The first random_opening_plies moves are random (seeded by seed), so that
+# the games of a match differ. The game is a draw after max_plies or when a position appears for the third time.
+def play_game(white, black, max_plies=200, random_opening_plies=2, seed=0):
+    rng = random.Random(seed)
+    gs = CheckersEngine.BitboardGameState()
+    players = (white, black)
+    searchers = (white.new_searcher(), black.new_searcher())
+    nodes = [0, 0]
+    search_time = [0.0, 0.0]
+    moves = [0, 0]
+    position_counts = {gs.zobrist_key: 1}
+
+    for ply in range(max_plies):
+        possible_moves_extended = gs.get_compact_moves()
+        if len(possible_moves_extended) == 0:
+            return GameResult(-1 if gs.white_to_move else 1, ply, nodes, search_time, moves, gs.get_move_history())
+
+        side = 0 if gs.white_to_move else 1
+        if ply < random_opening_plies:
+            move = rng.choice(possible_moves_extended)
+        else:
+            start_time = time.time()
+            move, result = players[side].choose_move(gs, searchers[side], rng)
+            search_time[side] += time.time() - start_time
+            moves[side] += 1
+            if result is not None:
+                nodes[side] += result.nodes + result.quiescence_nodes
+            if move is None:
+                move = rng.choice(possible_moves_extended)
+        gs.make_compact_move(move)
+
+        position_counts[gs.zobrist_key] = position_counts.get(gs.zobrist_key, 0) + 1
+        if position_counts[gs.zobrist_key] >= 3:
+            return GameResult(0, ply + 1, nodes, search_time, moves, gs.get_move_history())
+
+    return GameResult(0, max_plies, nodes, search_time, moves, gs.get_move_history())
+
+
+# Summary of a match from the point of view of player a. The statistics are indexed by 0 for a and 1 for b.
+class MatchResult:
+    def __init__(self, player_a, player_b):
+        self.player_a = player_a
+        self.player_b = player_b
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.nodes = [0, 0]
+        self.search_time = [0.0, 0.0]
+        self.moves = [0, 0]
+        self.elapsed_time = 0.0
+
+    def add_game(self, game_result, a_is_white):
+        a_side = 0 if a_is_white else 1
+        score = game_result.winner if a_is_white else -game_result.winner
+        if score > 0:
+            self.wins += 1
+        elif score < 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        for player, side in ((0, a_side), (1, 1 - a_side)):
+            self.nodes[player] += game_result.nodes[side]
+            self.search_time[player] += game_result.search_time[side]
+            self.moves[player] += game_result.moves[side]
+
+    def get_games(self):
+        return self.wins + self.draws + self.losses
+
+    def get_average_nodes_per_move(self, player):
+        return self.nodes[player] / self.moves[player] if self.moves[player] else 0.0
+
+    def get_average_time_per_move(self, player):
+        return self.search_time[player] / self.moves[player] if self.moves[player] else 0.0
+
+    def __str__(self):
+        lines = [f"{self.player_a} vs {self.player_b}: {self.get_games()} games in {self.elapsed_time:.1f} s",
+                 f"wins: {self.wins}, draws: {self.draws}, losses: {self.losses}"]
+        for player, name in ((0, self.player_a), (1, self.player_b)):
+            lines.append(f"{name}: {self.get_average_nodes_per_move(player):.1f} nodes/move, "
+                         f"{self.get_average_time_per_move(player) * 1000:.1f} ms/move")
+        return "\n".join(lines)
+
+
+def play_match_game(player_a, player_b, game_index, max_plies, random_opening_plies, seed):
+    a_is_white = game_index % 2 == 0  # players change colors every game
+    white, black = (player_a, player_b) if a_is_white else (player_b, player_a)
+    # both games of a color-swapped pair start with the same random opening
+    result = play_game(white, black, max_plies, random_opening_plies, seed * 1000003 + game_index // 2)
+    return result, a_is_white
+
+
+# Play games between player_a and player_b in worker processes (one per CPU by default). The games are written to
+# pdn_file (an open text file) if it is given.
+def run_match(player_a, player_b, games=100, workers=None, max_plies=200, random_opening_plies=2, seed=0,
+              pdn_file=None):
+    match_result = MatchResult(player_a, player_b)
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_match_game, player_a, player_b, game_index, max_plies, random_opening_plies, seed)
+                   for game_index in range(games)]
+        for game_index, future in enumerate(futures):
+            game_result, a_is_white = future.result()
+            match_result.add_game(game_result, a_is_white)
+            if pdn_file is not None:
+                white, black = (player_a, player_b) if a_is_white else (player_b, player_a)
+                CheckersPdn.write_games(pdn_file, [game_result.get_pdn_game(str(white), str(black), game_index + 1)])
+    match_result.elapsed_time = time.time() - start_time
+    return match_result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine matches without a display.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--player-a", default="min_max:4", help="search[:depth[:time_budget_ms]]")
+    parser.add_argument("--player-b", default="min_max:3", help="search[:depth[:time_budget_ms]]")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--random-opening-plies", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdn", help="file the games are written to")
+    parser.add_argument("--weights-a", help="evaluation weights file of player a, material only by default")
+    parser.add_argument("--weights-b", help="evaluation weights file of player b, material only by default")
+    args = parser.parse_args()
+
+    player_a = Player.from_string(args.player_a)
+    player_a.weights_path = args.weights_a
+    player_b = Player.from_string(args.player_b)
+    player_b.weights_path = args.weights_b
+
+    pdn_file = open(args.pdn, "w", encoding="utf-8") if args.pdn else None
+    try:
+        match_result = run_match(player_a, player_b, args.games, args.workers, args.max_plies,
+                                 args.random_opening_plies, args.seed, pdn_file)
+    finally:
+        if pdn_file is not None:
+            pdn_file.close()
+    print(match_result)
+
+
+if __name__ == '__main__':
+    main()
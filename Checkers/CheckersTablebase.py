@@ -0,0 +1,395 @@
+"""
+Endgame tablebases. For every material signature (the number of white men, black men, white kings and black kings)
+with at most a few pieces, every position is solved by retrograde analysis: the positions without a move are lost,
+a position is won in n + 1 plies if a move leads to a position lost in n plies, and it is lost in n + 1 plies if
+every move leads to a position won in at most n plies. The positions that are never resolved are draws.
+Captures and promotions lead to other signatures, which are solved first.
+
+Every position has an index that is computed from its bitmasks in O(1) (see get_index), and one byte per index is
+stored: 0 for a draw (or an impossible position), otherwise the distance to the end of the game in plies plus 1.
+An odd distance is a win for the side to move, an even distance a loss.
+Each signature is written to its own file of zlib compressed blocks. The probe only decompresses the block of the
+position and keeps recently used blocks in an LRU cache.
+
+Usage: python CheckersTablebase.py --max-pieces 3
+"""
+import argparse
+import itertools
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+import CheckersEngine
+
+MAGIC = b"CTB1"
+HEADER = struct.Struct("<4sIII")  # magic, position count, block size, block count
+OFFSET = struct.Struct("<I")
+BLOCK_SIZE = 1 << 16
+DEFAULT_TABLEBASE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+SQUARE_COUNT = 50
+# a won position scores WIN_SCORE minus its distance, the same score as GameState with no move left at distance 0
+WIN_SCORE = 100
+
+SQUARE_OF_BIT = [-1] * CheckersEngine.BIT_COUNT  # square - 1 of each bit
+for _bit in CheckersEngine.iterate_bits(CheckersEngine.BOARD_MASK):
+    _row, _col = CheckersEngine.BIT_TO_ROW_COL[_bit]
+    SQUARE_OF_BIT[_bit] = CheckersEngine.Move.row_col_to_square_position[(_row, _col)] - 1
+BIT_OF_SQUARE = [SQUARE_OF_BIT.index(_square) for _square in range(SQUARE_COUNT)]
+BINOMIALS = [[math.comb(n, k) for k in range(SQUARE_COUNT + 1)] for n in range(SQUARE_COUNT + 1)]
+
+
+# The signature of the position given by the piece masks: the counts of (white men, black men, white kings,
+# black kings)
+def get_signature(masks):
+    return masks[1].bit_count(), masks[2].bit_count(), masks[3].bit_count(), masks[4].bit_count()
+
+
+def get_signature_name(signature):
+    return "".join(f"{name}{count}" for name, count in zip(("wm", "bm", "wk", "bk"), signature) if count)
+
+
+# Size of the index space of a signature: the squares of each piece type are ranked as a combination of the
+# 50 squares, so positions where pieces of different types share a square are counted too (and never used)
+def get_position_count(signature):
+    position_count = 2
+    for count in signature:
+        position_count *= BINOMIALS[SQUARE_COUNT][count]
+    return position_count
+
+
+def get_index(signature, masks, white_to_move):
+    index = 0
+    for piece_id in (4, 3, 2, 1):
+        rank = 0
+        k = 1
+        for bit in CheckersEngine.iterate_bits(masks[piece_id]):
+            rank += BINOMIALS[SQUARE_OF_BIT[bit]][k]
+            k += 1
+        index = index * BINOMIALS[SQUARE_COUNT][signature[piece_id - 1]] + rank
+    return index * 2 + (0 if white_to_move else 1)
+
+
+# Score of a stored value for the side to move, 0 for a draw
+def get_value_score(value):
+    if value == 0:
+        return 0
+    distance = value - 1
+    return WIN_SCORE - distance if distance % 2 else -(WIN_SCORE - distance)
+
+
+# All signatures with at most max_pieces pieces and at least one piece per side, in the order they have to be
+# solved: fewer pieces first (captures), and fewer men first (promotions)
+def get_signatures(max_pieces):
+    signatures = []
+    for signature in itertools.product(range(max_pieces + 1), repeat=4):
+        white = signature[0] + signature[2]
+        black = signature[1] + signature[3]
+        if white and black and white + black <= max_pieces:
+            signatures.append(signature)
+    signatures.sort(key=lambda signature: (sum(signature), signature[0] + signature[1], signature))
+    return signatures
+
+
+class Tablebase:
+    """
+    Reads the tablebase files of a directory. A file is mapped with mmap when it is first used, and the decompressed
+    blocks are kept in an LRU cache of at most cache_blocks blocks. The default tablebase is shared by every
+    Searcher of a process, so the files and the cache are guarded by a lock and searches can probe it from several
+    threads.
+    """
+
+    def __init__(self, directory=DEFAULT_TABLEBASE_DIRECTORY, cache_blocks=256):
+        self.directory = directory
+        self.cache_blocks = cache_blocks
+        self.cache = OrderedDict()  # (signature, block) -> bytes
+        self.files = {}  # signature -> (file, mmap, block count), or None if there is no file for the signature
+        self.lock = threading.Lock()  # guards files, cache and block_loads
+        self.max_pieces = 0
+        for file_name in os.listdir(directory) if os.path.isdir(directory) else ():
+            signature = self.parse_file_name(file_name)
+            if signature is not None:
+                self.max_pieces = max(self.max_pieces, sum(signature))
+
+        self.hits = 0
+        self.misses = 0
+        self.block_loads = 0
+
+    @staticmethod
+    def get_file_name(signature):
+        return get_signature_name(signature) + ".tb"
+
+    @staticmethod
+    def parse_file_name(file_name):
+        if not file_name.endswith(".tb"):
+            return None
+        counts = dict.fromkeys(("wm", "bm", "wk", "bk"), 0)
+        name = file_name[:-3]
+        for position in range(0, len(name), 3):
+            counts[name[position:position + 2]] = int(name[position + 2])
+        return counts["wm"], counts["bm"], counts["wk"], counts["bk"]
+
+    def close(self):
+        with self.lock:
+            for opened in self.files.values():
+                if opened is not None:
+                    opened[1].close()
+                    opened[0].close()
+            self.files.clear()
+            self.cache.clear()
+
+    def __getstate__(self):
+        return {"directory": self.directory, "cache_blocks": self.cache_blocks}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["cache_blocks"])
+
+    # Map the file of the signature, called with the lock held
+    def open_file(self, signature):
+        path = os.path.join(self.directory, self.get_file_name(signature))
+        if not os.path.exists(path):
+            self.files[signature] = None
+            return None
+        file = open(path, "rb")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, position_count, block_size, block_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or position_count != get_position_count(signature) or block_size != BLOCK_SIZE:
+            data.close()
+            file.close()
+            raise ValueError(f"not a tablebase file for {get_signature_name(signature)}: {path}")
+        self.files[signature] = (file, data, block_count)
+        return self.files[signature]
+
+    # Stored value of a position (see the module docstring), or None if its signature is not in the tablebase
+    def get_value(self, signature, index):
+        block = index // BLOCK_SIZE
+        with self.lock:
+            values = self.cache.get((signature, block))
+            if values is None:
+                opened = self.files[signature] if signature in self.files else self.open_file(signature)
+                if opened is None:
+                    return None
+                data = opened[1]
+                start = HEADER.size + OFFSET.size * block
+                values = zlib.decompress(data[OFFSET.unpack_from(data, start)[0]:
+                                              OFFSET.unpack_from(data, start + OFFSET.size)[0]])
+                self.block_loads += 1
+                self.cache[(signature, block)] = values
+                if len(self.cache) > self.cache_blocks:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end((signature, block))
+        return values[index % BLOCK_SIZE]
+
+    # Score of the position given by the piece masks for the side to move, or None if it is not in the tablebase
+    def probe_masks(self, masks, white_to_move):
+        signature = get_signature(masks)
+        if white_to_move and signature[0] + signature[2] == 0 or \
+                not white_to_move and signature[1] + signature[3] == 0:
+            return -WIN_SCORE  # the side to move has no piece left
+        if sum(signature) > self.max_pieces:
+            self.misses += 1
+            return None
+        value = self.get_value(signature, get_index(signature, masks, white_to_move))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return get_value_score(value)
+
+    # Score of the position of gs (positive is good for white, like the search scores), or None if it is not in the
+    # tablebase
+    def probe(self, gs):
+        white_men, black_men, white_kings, black_kings, white_to_move = gs.get_snapshot()
+        score = self.probe_masks([0, white_men, black_men, white_kings, black_kings], white_to_move)
+        if score is None:
+            return None
+        return score if white_to_move else -score
+
+    def get_stats(self):
+        return {"max_pieces": self.max_pieces, "hits": self.hits, "misses": self.misses,
+                "block_loads": self.block_loads, "cached_blocks": len(self.cache)}
+
+
+# The tablebase in DEFAULT_TABLEBASE_DIRECTORY, opened once per process, or None if no tablebase has been generated
+default_tablebase = None
+
+
+def get_default_tablebase():
+    global default_tablebase
+    if default_tablebase is None and os.path.isdir(DEFAULT_TABLEBASE_DIRECTORY):
+        tablebase = Tablebase(DEFAULT_TABLEBASE_DIRECTORY)
+        if tablebase.max_pieces:
+            default_tablebase = tablebase
+    return default_tablebase
+
+
+class TablebaseGenerator:
+    """
+    Solves the signatures of up to max_pieces pieces and writes one file per signature. The solved tables are kept
+    in memory, because the captures and promotions of the next signatures lead into them.
+    """
+
+    def __init__(self, max_pieces=3, directory=DEFAULT_TABLEBASE_DIRECTORY):
+        self.max_pieces = max_pieces
+        self.directory = directory
+        self.tables = {}  # signature -> bytearray of the stored values
+
+    def generate(self, verbose=True):
+        os.makedirs(self.directory, exist_ok=True)
+        for signature in get_signatures(self.max_pieces):
+            start_time = time.time()
+            values = self.solve(signature)
+            self.tables[signature] = values
+            self.write(signature, values)
+            if verbose:
+                wins = sum(1 for value in values if value and (value - 1) % 2)
+                losses = sum(1 for value in values if value and not (value - 1) % 2)
+                print(f"{get_signature_name(signature)}: {wins} wins, {losses} losses, "
+                      f"max distance {max(values) - 1}, {time.time() - start_time:.1f} s")
+
+    # Yield the piece masks of every legal placement of the pieces of a signature (no man on its promotion row)
+    @staticmethod
+    def get_placements(signature):
+        white_man_squares = [square for square in range(SQUARE_COUNT)
+                             if not CheckersEngine.PROMOTION_MASKS[1] >> BIT_OF_SQUARE[square] & 1]
+        black_man_squares = [square for square in range(SQUARE_COUNT)
+                             if not CheckersEngine.PROMOTION_MASKS[2] >> BIT_OF_SQUARE[square] & 1]
+        square_choices = (white_man_squares, black_man_squares, range(SQUARE_COUNT), range(SQUARE_COUNT))
+        groups = [itertools.combinations(squares, count) for squares, count in zip(square_choices, signature)]
+        for placement in itertools.product(*groups):
+            occupied = [square for squares in placement for square in squares]
+            if len(set(occupied)) != len(occupied):
+                continue
+            masks = [0, 0, 0, 0, 0]
+            for piece_id, squares in enumerate(placement, 1):
+                for square in squares:
+                    masks[piece_id] |= 1 << BIT_OF_SQUARE[square]
+            yield masks
+
+    # Stored value of a position reached by a capture or a promotion, for the side to move in that position
+    def get_exit_value(self, masks, white_to_move):
+        signature = get_signature(masks)
+        if white_to_move and signature[0] + signature[2] == 0 or \
+                not white_to_move and signature[1] + signature[3] == 0:
+            return 1  # no piece left: lost at distance 0
+        return self.tables[signature][get_index(signature, masks, white_to_move)]
+
+    def solve(self, signature):
+        position_count = get_position_count(signature)
+        values = bytearray(position_count)
+        remaining = array("i", bytes(4 * position_count))  # moves into the signature that are not resolved yet
+        max_win_distance = array("h", [-1]) * position_count  # largest distance of a move to a won position
+        exits_lost = bytearray(position_count)  # 1 if every capture or promotion leads to a win of the opponent
+        child_start = {}  # index -> (first, end) in children
+        children = array("I")
+        buckets = [[]]  # buckets[distance] holds the positions that may be resolved at that distance
+
+        def push(distance, index):
+            while distance >= len(buckets):
+                buckets.append([])
+            buckets[distance].append(index)
+
+        buffer = []
+        for masks in self.get_placements(signature):
+            for white_to_move in (True, False):
+                index = get_index(signature, masks, white_to_move)
+                move_count = CheckersEngine.generate_bitboard_moves(masks, white_to_move, buffer)
+                if move_count == 0:
+                    push(0, index)
+                    continue
+                first = len(children)
+                best_win = None
+                all_exits_lost = True
+                for move_index in range(move_count):
+                    child_masks = CheckersEngine.get_masks_after_move(masks, white_to_move, buffer[move_index])
+                    child_signature = get_signature(child_masks)
+                    if child_signature == signature:
+                        children.append(get_index(signature, child_masks, not white_to_move))
+                        continue
+                    value = self.get_exit_value(child_masks, not white_to_move)
+                    if value == 0:
+                        all_exits_lost = False
+                    elif (value - 1) % 2:  # the opponent wins
+                        max_win_distance[index] = max(max_win_distance[index], value - 1)
+                    else:
+                        all_exits_lost = False
+                        best_win = value if best_win is None else min(best_win, value)
+                child_start[index] = (first, len(children))
+                remaining[index] = len(children) - first
+                exits_lost[index] = all_exits_lost
+                if best_win is not None:
+                    push(best_win, index)
+                elif remaining[index] == 0 and all_exits_lost:
+                    push(max_win_distance[index] + 1, index)
+
+        # reverse the moves inside the signature: parents[parent_start[i]:parent_start[i + 1]] lead to position i
+        parent_start = array("I", bytes(4 * (position_count + 1)))
+        for child in children:
+            parent_start[child + 1] += 1
+        for index in range(position_count):
+            parent_start[index + 1] += parent_start[index]
+        parents = array("I", bytes(4 * len(children)))
+        fill = array("I", parent_start)
+        for parent, (first, end) in child_start.items():
+            for child_index in range(first, end):
+                child = children[child_index]
+                parents[fill[child]] = parent
+                fill[child] += 1
+
+        distance = 0
+        while distance < len(buckets):
+            for index in buckets[distance]:
+                if values[index]:
+                    continue  # resolved at a shorter distance
+                if distance >= 255:
+                    raise ValueError(f"distance of {get_signature_name(signature)} does not fit in a byte")
+                values[index] = distance + 1
+                for parent_index in range(parent_start[index], parent_start[index + 1]):
+                    parent = parents[parent_index]
+                    if values[parent]:
+                        continue
+                    if distance % 2 == 0:  # the position is lost, so its parent is won
+                        push(distance + 1, parent)
+                    else:
+                        remaining[parent] -= 1
+                        if distance > max_win_distance[parent]:
+                            max_win_distance[parent] = distance
+                        if remaining[parent] == 0 and exits_lost[parent]:
+                            push(max_win_distance[parent] + 1, parent)
+            buckets[distance] = None
+            distance += 1
+        return values
+
+    def write(self, signature, values):
+        blocks = [zlib.compress(bytes(values[start:start + BLOCK_SIZE]), 9)
+                  for start in range(0, len(values), BLOCK_SIZE)]
+        offset = HEADER.size + OFFSET.size * (len(blocks) + 1)
+        path = os.path.join(self.directory, Tablebase.get_file_name(signature))
+        with open(path + ".tmp", "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(values), BLOCK_SIZE, len(blocks)))
+            for block in blocks:
+                file.write(OFFSET.pack(offset))
+                offset += len(block)
+            file.write(OFFSET.pack(offset))
+            for block in blocks:
+                file.write(block)
+        os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the endgame tablebases.")
+    parser.add_argument("--max-pieces", type=int, default=3,
+                        help="largest number of pieces on the board, 4 takes hours and several GB of memory")
+    parser.add_argument("--output", default=DEFAULT_TABLEBASE_DIRECTORY)
+    args = parser.parse_args()
+    TablebaseGenerator(args.max_pieces, args.output).generate()
+
+
+if __name__ == '__main__':
+    main()
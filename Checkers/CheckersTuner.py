@@ -0,0 +1,251 @@
+"""
+Texel tuning of the evaluation weights (see CheckersEvaluation). The evaluation is linear in its weights, so the
+score of a position is the dot product of its features and the weights. The tuner finds the weights that best
+predict the results of the games the positions were taken from: a score is turned into an expected result with
+sigmoid(scale * score), and the mean squared error against the real results (1 for a white win, 0.5 for a draw,
+0 for a black win) is minimized by gradient descent (Adam).
+
+The data is prepared in two steps, both streamed from disk:
+    corpus      the quiet positions of PDN games (e.g. written by CheckersSelfPlay --pdn) with the game results,
+                stored as fixed size records: a packed snapshot (see CheckersEngine.pack_snapshot) and the result
+    features    the feature rows of the corpus positions, computed by worker processes and written to a .npy
+                file with the result in the last column. Tuning reads it through a memory map, in chunks that are
+                spread over worker processes, so the corpus can be larger than memory.
+The tuner needs NumPy, an optional dependency (see requirements-optional.txt).
+
+Usage:
+    python CheckersSelfPlay.py --games 1000 --player-a min_max_with_cache:4 --player-b min_max_with_cache:4 \
+        --pdn games.pdn
+    python CheckersTuner.py corpus games.pdn --output corpus.bin
+    python CheckersTuner.py features corpus.bin --output features.npy
+    python CheckersTuner.py tune features.npy --epochs 200
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import CheckersEngine
+import CheckersEvaluation
+import CheckersPdn
+
+RECORD_SIZE = CheckersEngine.SNAPSHOT_SIZE + 1  # packed snapshot and the game result (-1, 0 or 1) as a signed byte
+GAME_RESULTS = {"2-0": 1, "1-0": 1, "1-1": 0, "0-0": 0, "0-2": -1, "0-1": -1}
+CHUNK_SIZE = 1 << 15  # positions per task of a worker process
+PARAMETER_COUNT = len(CheckersEvaluation.Evaluation.get_parameter_names())
+
+
+# Write the quiet positions (no capture for the side to move) of the games in the PDN files to the corpus file,
+# skipping the first skip_plies plies of each game. Unfinished and invalid games are skipped.
+# Return the number of positions and of skipped games.
+def write_corpus(pdn_paths, corpus_path, skip_plies=8):
+    positions = 0
+    skipped_games = 0
+    with open(corpus_path, "wb") as corpus_file:
+        for pdn_path in pdn_paths:
+            with open(pdn_path, encoding="utf-8", errors="replace") as pdn_file:
+                for game in CheckersPdn.read_games(pdn_file):
+                    if game.result not in GAME_RESULTS:
+                        skipped_games += 1
+                        continue
+                    result_byte = GAME_RESULTS[game.result].to_bytes(1, "little", signed=True)
+                    records = []
+                    try:
+                        gs = CheckersEngine.BitboardGameState.from_fen(game.get_start_fen())
+                        for ply, text in enumerate(game.moves):
+                            legal_moves = gs.get_compact_moves()
+                            if ply >= skip_plies and not legal_moves[0] & CheckersEngine.CAPTURE_FLAG:
+                                records.append(gs.get_packed_snapshot() + result_byte)
+                            gs.make_compact_move(CheckersPdn.parse_move(text, legal_moves))
+                    except (ValueError, IndexError):
+                        skipped_games += 1
+                        continue
+                    corpus_file.write(b"".join(records))
+                    positions += len(records)
+    return positions, skipped_games
+
+
+# Feature rows of records first to first + count of the corpus, with the expected result (1, 0.5 or 0) appended
+def compute_feature_chunk(corpus_path, first, count):
+    with open(corpus_path, "rb") as corpus_file:
+        corpus_file.seek(first * RECORD_SIZE)
+        data = corpus_file.read(count * RECORD_SIZE)
+    rows = np.empty((count, PARAMETER_COUNT + 1), dtype=np.float32)
+    for index in range(count):
+        offset = index * RECORD_SIZE
+        snapshot = CheckersEngine.unpack_snapshot(data, offset)
+        rows[index, :PARAMETER_COUNT] = CheckersEvaluation.Evaluation.get_features(*snapshot[:4])
+        rows[index, PARAMETER_COUNT] = (int.from_bytes(data[offset + RECORD_SIZE - 1:offset + RECORD_SIZE], "little",
+                                                       signed=True) + 1) / 2
+    return first, rows
+
+
+# Compute the features of every corpus position in worker processes and write them to features_path
+def write_features(corpus_path, features_path, workers=None):
+    record_count = os.path.getsize(corpus_path) // RECORD_SIZE
+    features = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float32,
+                                         shape=(record_count, PARAMETER_COUNT + 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(compute_feature_chunk, corpus_path, first, min(CHUNK_SIZE, record_count - first))
+                   for first in range(0, record_count, CHUNK_SIZE)]
+        for future in futures:
+            first, rows = future.result()
+            features[first:first + len(rows)] = rows
+    features.flush()
+    return record_count
+
+
+def sigmoid(values):
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+# Squared error sum and its gradient over rows start to stop of the feature file
+def compute_error_chunk(features_path, start, stop, parameters, scale, with_gradient):
+    rows = np.load(features_path, mmap_mode="r")[start:stop]
+    features = np.asarray(rows[:, :PARAMETER_COUNT], dtype=np.float64)
+    results = np.asarray(rows[:, PARAMETER_COUNT], dtype=np.float64)
+    predictions = sigmoid(scale * (features @ parameters))
+    errors = predictions - results
+    error = float(errors @ errors)
+    if not with_gradient:
+        return error, None
+    return error, features.T @ (2.0 * scale * errors * predictions * (1.0 - predictions))
+
+
+class TexelTuner:
+    """
+    Tunes the parameters of an Evaluation (see Evaluation.get_parameters) on a feature file made by write_features.
+    The parameters in fixed keep their value, by default the weight of a man, which sets the unit of the scores.
+    """
+
+    def __init__(self, features_path, evaluation=None, workers=None, fixed=("man",), l2=1e-5):
+        self.features_path = features_path
+        self.evaluation = evaluation if evaluation is not None else CheckersEvaluation.Evaluation()
+        self.position_count = np.load(features_path, mmap_mode="r").shape[0]
+        if not self.position_count:
+            raise ValueError(f"no positions in {features_path}")
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        names = CheckersEvaluation.Evaluation.get_parameter_names()
+        self.trainable = np.array([name not in fixed for name in names], dtype=np.float64)
+        self.l2 = l2  # weight of the L2 penalty on the parameters, keeps rarely seen squares near 0
+        self.scale = 1.0
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Mean squared error of the parameters, and its gradient if with_gradient
+    def compute_error(self, parameters, scale, with_gradient=False):
+        futures = [self.pool.submit(compute_error_chunk, self.features_path, start,
+                                    min(start + CHUNK_SIZE, self.position_count), parameters, scale, with_gradient)
+                   for start in range(0, self.position_count, CHUNK_SIZE)]
+        error = 0.0
+        gradient = np.zeros(PARAMETER_COUNT) if with_gradient else None
+        for future in futures:
+            chunk_error, chunk_gradient = future.result()
+            error += chunk_error
+            if with_gradient:
+                gradient += chunk_gradient
+        error /= self.position_count
+        if with_gradient:
+            gradient /= self.position_count
+        return error, gradient
+
+    # Find the scale of the sigmoid that fits the current parameters best (golden section search), the first step
+    # of Texel tuning, so the tuning changes the weights and not the scale. Every iteration keeps one of the two
+    # inner points and its error, so it costs one pass over the corpus.
+    def fit_scale(self, low=0.05, high=20.0, iterations=30):
+        parameters = np.array(self.evaluation.get_parameters())
+        ratio = (math.sqrt(5) - 1) / 2
+        left = high - ratio * (high - low)
+        right = low + ratio * (high - low)
+        left_error = self.compute_error(parameters, left)[0]
+        right_error = self.compute_error(parameters, right)[0]
+        for _ in range(iterations):
+            if left_error < right_error:
+                high, right, right_error = right, left, left_error
+                left = high - ratio * (high - low)
+                left_error = self.compute_error(parameters, left)[0]
+            else:
+                low, left, left_error = left, right, right_error
+                right = low + ratio * (high - low)
+                right_error = self.compute_error(parameters, right)[0]
+        self.scale = (low + high) / 2
+        return self.scale
+
+    # Run epochs of full batch Adam and set the tuned parameters in the evaluation. progress_callback, if given, is
+    # called with (epoch, error) after every epoch. Return the error before and after tuning.
+    def tune(self, epochs=100, learning_rate=0.01, progress_callback=None):
+        parameters = np.array(self.evaluation.get_parameters())
+        first_moment = np.zeros(PARAMETER_COUNT)
+        second_moment = np.zeros(PARAMETER_COUNT)
+        start_error = None
+        error = None
+        for epoch in range(1, epochs + 1):
+            error, gradient = self.compute_error(parameters, self.scale, True)
+            if start_error is None:
+                start_error = error
+            gradient = (gradient + 2 * self.l2 * parameters) * self.trainable
+            first_moment = 0.9 * first_moment + 0.1 * gradient
+            second_moment = 0.999 * second_moment + 0.001 * gradient * gradient
+            step = first_moment / (1 - 0.9 ** epoch) / (np.sqrt(second_moment / (1 - 0.999 ** epoch)) + 1e-12)
+            parameters -= learning_rate * step
+            if progress_callback is not None:
+                progress_callback(epoch, error)
+        error = self.compute_error(parameters, self.scale)[0]
+        self.evaluation.set_parameters(parameters.tolist())
+        return start_error, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on the results of PDN games.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    corpus_parser = commands.add_parser("corpus", help="extract the quiet positions of PDN games")
+    corpus_parser.add_argument("pdn", nargs="+")
+    corpus_parser.add_argument("--output", default="corpus.bin")
+    corpus_parser.add_argument("--skip-plies", type=int, default=8)
+    features_parser = commands.add_parser("features", help="compute the features of a corpus")
+    features_parser.add_argument("corpus")
+    features_parser.add_argument("--output", default="features.npy")
+    features_parser.add_argument("--workers", type=int, default=None)
+    tune_parser = commands.add_parser("tune", help="tune the weights on a feature file")
+    tune_parser.add_argument("features")
+    tune_parser.add_argument("--weights", help="weights to start from, the default weights otherwise")
+    tune_parser.add_argument("--output", default=CheckersEvaluation.DEFAULT_WEIGHTS_PATH)
+    tune_parser.add_argument("--epochs", type=int, default=200)
+    tune_parser.add_argument("--learning-rate", type=float, default=0.01)
+    tune_parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.command == "corpus":
+        positions, skipped_games = write_corpus(args.pdn, args.output, args.skip_plies)
+        print(f"{positions} positions written to {args.output}, {skipped_games} games skipped")
+    elif args.command == "features":
+        positions = write_features(args.corpus, args.output, args.workers)
+        print(f"features of {positions} positions written to {args.output}")
+    else:
+        evaluation = CheckersEvaluation.Evaluation()
+        if args.weights:
+            evaluation.load(args.weights)
+        with TexelTuner(args.features, evaluation, args.workers) as tuner:
+            scale = tuner.fit_scale()
+            print(f"{tuner.position_count} positions, scale: {scale:.3f}")
+            start_error, error = tuner.tune(args.epochs, args.learning_rate,
+                                            lambda epoch, epoch_error: epoch % 10 == 0 and
+                                            print(f"epoch {epoch}: error {epoch_error:.6f}"))
+        evaluation.save(args.output)
+        print(f"error {start_error:.6f} -> {error:.6f}, weights written to {args.output}")
+    print(f"{time.time() - start_time:.1f} s")
+
+
+if __name__ == '__main__':
+    main()